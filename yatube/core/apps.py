@@ -3,3 +3,15 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+
+        from core import checks  # noqa: F401
+        from core.db import apply_sqlite_pragmas
+        from core.metrics import instrument_templates
+        instrument_templates()
+        connection_created.connect(apply_sqlite_pragmas)
+        if settings.PERFORMANCE_SELF_CHECK:
+            checks.log_performance_warnings()
@@ -0,0 +1,93 @@
+"""
+Проверка настроек, которые заметно замедляют работу под нагрузкой.
+
+Проверки зарегистрированы в системе checks Django с тегом performance
+и выполняются командой `manage.py check --deploy`. При
+PERFORMANCE_SELF_CHECK они же пишутся в лог при старте процесса.
+"""
+import logging
+
+from django.conf import settings
+from django.core import checks
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+# Кэши без атомарных incr и add: на них ломаются версии тегов страниц
+# и блокировка их отрисовки.
+NON_ATOMIC_CACHES = (
+    'django.core.cache.backends.filebased.FileBasedCache',
+)
+CACHED_LOADER = 'django.template.loaders.cached.Loader'
+
+
+def _uses_cached_loader(engine):
+    return any(
+        (loader[0] if isinstance(loader, (list, tuple)) else loader)
+        == CACHED_LOADER
+        for loader in engine.engine.loaders
+    )
+
+
+@checks.register('performance', deploy=True)
+def check_performance_settings(app_configs=None, **kwargs):
+    warnings = []
+    if settings.DEBUG:
+        warnings.append(checks.Warning(
+            'DEBUG включён: каждый SQL-запрос копится в памяти процесса.',
+            hint='Задайте DJANGO_DEBUG=0.',
+            id='core.W001',
+        ))
+    for alias, cache in settings.CACHES.items():
+        if cache['BACKEND'] in PROCESS_LOCAL_CACHES:
+            warnings.append(checks.Warning(
+                f'Кэш {alias} не общий: у каждого процесса он свой.',
+                hint='Используйте кэш-сервер (DJANGO_CACHE_URL).',
+                id='core.W002',
+            ))
+        elif cache['BACKEND'] in NON_ATOMIC_CACHES:
+            warnings.append(checks.Warning(
+                f'Кэш {alias}: incr и add не атомарны, параллельные '
+                f'процессы теряют версии тегов и блокировки.',
+                hint='Используйте memcached или Redis (DJANGO_CACHE_URL).',
+                id='core.W006',
+            ))
+    journal_mode = getattr(settings, 'SQLITE_PRAGMAS', {}).get(
+        'journal_mode', ''
+    )
+    for alias, database in settings.DATABASES.items():
+        if not database.get('CONN_MAX_AGE'):
+            warnings.append(checks.Warning(
+                f'БД {alias}: соединение открывается на каждый запрос.',
+                hint='Задайте CONN_MAX_AGE.',
+                id='core.W003',
+            ))
+        if (database['ENGINE'].endswith('sqlite3')
+                and journal_mode.upper() != 'WAL'):
+            warnings.append(checks.Warning(
+                f'БД {alias}: SQLite без журнала WAL блокирует чтение '
+                f'на время записи.',
+                hint="Добавьте 'journal_mode': 'WAL' в SQLITE_PRAGMAS.",
+                id='core.W004',
+            ))
+    for engine in engines.all():
+        if (isinstance(engine, DjangoTemplates)
+                and not _uses_cached_loader(engine)):
+            warnings.append(checks.Warning(
+                f'Шаблоны {engine.name} перечитываются с диска при каждой '
+                f'отрисовке.',
+                hint='Включите django.template.loaders.cached.Loader.',
+                id='core.W005',
+            ))
+    return warnings
+
+
+def log_performance_warnings():
+    """Пишет в лог предупреждения о медленных настройках."""
+    for warning in check_performance_settings():
+        logger.warning('%s', warning)
@@ -0,0 +1,20 @@
+"""
+Настройка соединений с SQLite.
+
+PRAGMA из настройки SQLITE_PRAGMAS выполняются для каждого нового
+соединения: журнал WAL не блокирует чтение на время записи, а
+synchronous=NORMAL не делает fsync на каждый коммит.
+"""
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
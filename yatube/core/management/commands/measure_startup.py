@@ -0,0 +1,117 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MODES = ('cold', 'warm')
+PHASES = ('setup', 'warmup', 'first', 'second')
+HEADER = (
+    f'{"режим":<8}{"старт, мс":>12}{"прогрев, мс":>14}'
+    f'{"1-й запрос, мс":>17}{"2-й запрос, мс":>17}'
+)
+# Выполняется в отдельном процессе, чтобы старт был по-настоящему
+# холодным: ничего не импортировано и не скомпилировано.
+CHILD_SCRIPT = '''
+import json, os, sys, time
+from io import BytesIO
+
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+timings = {'setup': time.perf_counter() - start, 'warmup': 0.0}
+if sys.argv[1] == 'warm':
+    from core.warmup import warm_up
+    timings['warmup'] = warm_up()['time']
+host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+             if host != '*'), 'localhost')
+
+
+def get(path):
+    statuses = []
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host,
+        'REMOTE_ADDR': '127.0.0.1', 'wsgi.input': BytesIO(),
+        'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+    }
+    body = application(
+        environ, lambda status, headers, exc_info=None:
+        statuses.append(int(status.split()[0]))
+    )
+    b''.join(body)
+    body.close()
+    return statuses[0]
+
+
+for phase in ('first', 'second'):
+    start = time.perf_counter()
+    timings['status'] = get(sys.argv[2])
+    timings[phase] = time.perf_counter() - start
+print(json.dumps(timings))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет холодный старт WSGI-процесса без прогрева шаблонов и '
+        'URL и с ним: время запуска, прогрева и первых двух запросов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='/about/author/',
+            help='Страница для первых запросов (не должна требовать БД, '
+                 'если база не создана)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Сколько процессов запустить в каждом режиме (берётся '
+                 'медиана)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(HEADER)
+        for mode in MODES:
+            runs = [
+                self.run_child(mode, options['url'])
+                for _ in range(options['repeat'])
+            ]
+            median = {
+                phase: statistics.median(run[phase] for run in runs) * 1000
+                for phase in PHASES
+            }
+            self.stdout.write(
+                f'{mode:<8}{median["setup"]:>12.1f}{median["warmup"]:>14.1f}'
+                f'{median["first"]:>17.1f}{median["second"]:>17.1f}'
+            )
+
+    @staticmethod
+    def run_child(mode, url):
+        process = subprocess.run(
+            [sys.executable, '-c', CHILD_SCRIPT, mode, url],
+            cwd=settings.BASE_DIR,
+            env=dict(
+                os.environ,
+                DJANGO_SETTINGS_MODULE=os.environ.get(
+                    'DJANGO_SETTINGS_MODULE', 'yatube.settings'
+                ),
+                DJANGO_WARMUP_ON_STARTUP='0',
+            ),
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            raise CommandError(process.stderr.strip())
+        timings = json.loads(process.stdout.strip().splitlines()[-1])
+        if timings['status'] != 200:
+            raise CommandError(f'{url} вернул {timings["status"]}')
+        return timings
@@ -0,0 +1,145 @@
+"""
+Отдача медиафайлов.
+
+View core.views.media решает, можно ли отдавать файл, а сами байты
+передаёт веб-серверу: заголовком X-Accel-Redirect (nginx) или
+X-Sendfile (Apache, lighttpd), см. настройку MEDIA_SENDFILE. Без
+веб-сервера файл отдаёт FileResponse: WSGI-сервер с wsgi.file_wrapper
+(gunicorn, uWSGI) отправляет его через sendfile без копирования в
+Python. Запросы Range отдаются частями (206).
+
+Имена картинок и миниатюр — хеши содержимого, поэтому такие файлы
+кэшируются браузером навсегда.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+# Каталоги MEDIA_ROOT, файлы из которых видны всем.
+MEDIA_PUBLIC_DIRS = ('posts', 'cache')
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{32,64}\.\w+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+def media_path(path):
+    """Полный путь к публичному медиафайлу или Http404."""
+    if (path.split('/', 1)[0] not in MEDIA_PUBLIC_DIRS
+            or path.endswith('.tmp')):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    return full_path
+
+
+def parse_range(header, size):
+    """
+    Возвращает (начало, конец включительно) для одного диапазона
+    заголовка Range, None — если отдавать нужно весь файл. Бросает
+    ValueError, если диапазон за пределами файла.
+    """
+    match = RANGE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # bytes=-N: последние N байт.
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError
+    return start, end
+
+
+class RangeFile:
+    """Отдаёт блоками length байт файла начиная со start."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def __iter__(self):
+        while self.remaining > 0:
+            block = self.file.read(min(BLOCK_SIZE, self.remaining))
+            if not block:
+                return
+            self.remaining -= len(block)
+            yield block
+
+    def close(self):
+        self.file.close()
+
+
+def _if_range_matches(request, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    return if_range is None or parse_http_date_safe(if_range) == last_modified
+
+
+def _local_response(request, full_path, size, last_modified, content_type):
+    try:
+        byte_range = None
+        if _if_range_matches(request, last_modified):
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        response = FileResponse(
+            open(full_path, 'rb'), content_type=content_type
+        )
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            RangeFile(open(full_path, 'rb'), start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def file_response(request, path, full_path, stat):
+    """Ответ с файлом: через веб-сервер или напрямую."""
+    content_type = (
+        mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    )
+    last_modified = int(stat.st_mtime)
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_SENDFILE_PREFIX + quote(path)
+        )
+    elif settings.MEDIA_SENDFILE == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+    else:
+        response = _local_response(
+            request, full_path, stat.st_size, last_modified, content_type
+        )
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = (
+        IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(path)
+        else DEFAULT_CACHE_CONTROL
+    )
+    return response
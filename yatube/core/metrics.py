@@ -0,0 +1,180 @@
+"""
+Метрики производительности view: число SQL-запросов, время в БД,
+время отрисовки шаблонов и попадания в кэш.
+
+Метрики текущего запроса собирает ViewMetricsMiddleware, итоги по
+каждому view копятся в памяти процесса и отдаются view metrics.
+Там же копятся счётчики подсистем (например, попадания миниатюр),
+см. count().
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_metrics', default=None)
+_totals = {}
+_counters = {}
+_totals_lock = threading.Lock()
+
+
+class BudgetExceeded(AssertionError):
+    """View сделал больше SQL-запросов, чем позволяет его бюджет."""
+
+
+class RequestMetrics:
+    """Метрики одного запроса; экземпляр служит и execute_wrapper БД."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.total_time = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing (длительности в мс)."""
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits, '
+            f'{self.cache_misses} misses"',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ))
+
+
+def current_metrics():
+    """Метрики запроса, который сейчас обрабатывается, или None."""
+    return _current.get()
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def record_cache(hits=0, misses=0):
+    """Учитывает обращения к кэшу в метриках текущего запроса."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+def count(name, value=1):
+    """Увеличивает счётчик процесса name на value."""
+    if not value:
+        return
+    with _totals_lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def get_counters():
+    """Копия счётчиков процесса."""
+    with _totals_lock:
+        return dict(_counters)
+
+
+def record_view(view_name, metrics):
+    """Добавляет метрики запроса к итогам view."""
+    with _totals_lock:
+        totals = _totals.setdefault(view_name, {
+            'requests': 0,
+            'queries': 0,
+            'max_queries': 0,
+            'db_time': 0.0,
+            'template_time': 0.0,
+            'total_time': 0.0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'over_budget': 0,
+        })
+        totals['requests'] += 1
+        totals['queries'] += metrics.queries
+        totals['max_queries'] = max(totals['max_queries'], metrics.queries)
+        totals['db_time'] += metrics.db_time
+        totals['template_time'] += metrics.template_time
+        totals['total_time'] += metrics.total_time
+        totals['cache_hits'] += metrics.cache_hits
+        totals['cache_misses'] += metrics.cache_misses
+        if is_over_budget(view_name, metrics):
+            totals['over_budget'] += 1
+
+
+def get_totals():
+    """Копия итогов по всем view."""
+    with _totals_lock:
+        return {name: dict(totals) for name, totals in _totals.items()}
+
+
+def reset_totals():
+    with _totals_lock:
+        _totals.clear()
+        _counters.clear()
+
+
+def is_over_budget(view_name, metrics):
+    budget = settings.VIEW_QUERY_BUDGETS.get(view_name)
+    return budget is not None and metrics.queries > budget
+
+
+def check_budget(view_name, metrics):
+    """
+    Сообщает о превышении бюджета SQL-запросов. При VIEW_BUDGETS_STRICT
+    бросает BudgetExceeded, чтобы превышение роняло тесты.
+    """
+    if not is_over_budget(view_name, metrics):
+        return
+    message = (
+        f'{view_name}: {metrics.queries} SQL-запросов при бюджете '
+        f'{settings.VIEW_QUERY_BUDGETS[view_name]}'
+    )
+    if settings.VIEW_BUDGETS_STRICT:
+        raise BudgetExceeded(message)
+    logger.warning(message)
+
+
+def instrument_templates():
+    """
+    Оборачивает Template.render, чтобы считать время отрисовки.
+    Вложенные шаблоны (include, карточки) учитываются во внешнем.
+    """
+    render = Template.render
+    if getattr(render, 'instrumented', False):
+        return
+
+    @wraps(render)
+    def timed_render(self, context):
+        metrics = _current.get()
+        if metrics is None or metrics.template_depth:
+            return render(self, context)
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.template_depth -= 1
+            metrics.template_time += time.perf_counter() - start
+
+    timed_render.instrumented = True
+    Template.render = timed_render
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from core import metrics
+
+
+class ViewMetricsMiddleware:
+    """
+    Считает SQL-запросы, время в БД, отрисовку шаблонов и обращения
+    к кэшу для каждого запроса, отдаёт их в заголовке Server-Timing
+    (только при EXPOSE_METRICS) и сверяет число запросов с бюджетом
+    view из VIEW_QUERY_BUDGETS.
+    Чтобы учитывать запросы сессии и пользователя, middleware должен
+    стоять в MIDDLEWARE первым.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(request_metrics):
+                response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        request_metrics.total_time = time.perf_counter() - start
+        if settings.EXPOSE_METRICS:
+            response['Server-Timing'] = request_metrics.server_timing()
+        resolver_match = request.resolver_match
+        if resolver_match is not None:
+            view_name = resolver_match.view_name
+            metrics.record_view(view_name, request_metrics)
+            metrics.check_budget(view_name, request_metrics)
+        return response
@@ -0,0 +1,18 @@
+from django import template
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def replace_query(context, **params):
+    """
+    Возвращает строку запроса текущей страницы с заменёнными
+    параметрами; параметр со значением None удаляется.
+    """
+    query = context['request'].GET.copy()
+    for name, value in params.items():
+        query.pop(name, None)
+        if value is not None:
+            query[name] = value
+    return query.urlencode()
@@ -1,4 +1,14 @@
+import os
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseNotModified, JsonResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+from core.media import file_response, media_path
+from core.metrics import get_counters, get_totals
 
 
 def page_not_found(request, exception):
@@ -17,3 +27,33 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def metrics(request):
+    """
+    Итоги метрик по view и счётчики процесса (под ключом `counters`);
+    доступны сотрудникам, а при EXPOSE_METRICS — и с INTERNAL_IPS.
+    """
+    internal = (
+        settings.EXPOSE_METRICS
+        and request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+    )
+    if not internal and not request.user.is_staff:
+        raise PermissionDenied
+    return JsonResponse({**get_totals(), 'counters': get_counters()})
+
+
+@require_safe
+def media(request, path):
+    """
+    Отдаёт публичный медиафайл; байты передаёт веб-сервер или sendfile.
+    """
+    full_path = media_path(path)
+    stat = os.stat(full_path)
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'),
+        stat.st_mtime,
+        stat.st_size,
+    ):
+        return HttpResponseNotModified()
+    return file_response(request, path, full_path, stat)
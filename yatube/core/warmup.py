@@ -0,0 +1,84 @@
+"""
+Прогрев процесса перед первым запросом.
+
+warm_up() компилирует шаблоны проекта и разбирает URL-шаблоны, чтобы
+первый запрос к новому воркеру не платил за это сам. Шаблоны остаются в
+памяти только при кэширующем загрузчике, поэтому прогрев включается
+вместе с ним (WARMUP_ON_STARTUP в боевых настройках) и вызывается из
+yatube/wsgi.py.
+"""
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def _loaders(loaders):
+    for loader in loaders:
+        if hasattr(loader, 'loaders'):
+            # Кэширующий загрузчик сам ничего не читает, каталоги —
+            # у вложенных.
+            yield from _loaders(loader.loaders)
+        else:
+            yield loader
+
+
+def _template_names(engine):
+    """Имена шаблонов из каталогов проекта (без сторонних пакетов)."""
+    names = set()
+    for loader in _loaders(engine.engine.template_loaders):
+        for directory in loader.get_dirs():
+            directory = str(directory)
+            if not directory.startswith(settings.BASE_DIR):
+                continue
+            for root, _, files in os.walk(directory):
+                for file_name in files:
+                    if file_name.endswith('.html'):
+                        names.add(os.path.relpath(
+                            os.path.join(root, file_name), directory
+                        ).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def compile_templates():
+    """Компилирует шаблоны проекта и возвращает их число."""
+    compiled = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for name in _template_names(engine):
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError as error:
+                logger.warning('Шаблон %s не скомпилирован: %s', name, error)
+            else:
+                compiled += 1
+    return compiled
+
+
+def resolve_urls():
+    """Разбирает URL-шаблоны и возвращает число именованных маршрутов."""
+    resolver = get_resolver()
+    resolver.resolve('/')
+    return len(resolver.reverse_dict)
+
+
+def warm_up():
+    """Прогревает шаблоны и URL; возвращает итоги прогрева."""
+    start = time.perf_counter()
+    result = {
+        'templates': compile_templates(),
+        'urls': resolve_urls(),
+    }
+    result['time'] = time.perf_counter() - start
+    logger.info(
+        'Прогрев: %(templates)d шаблонов, %(urls)d маршрутов '
+        'за %(time).3f с', result,
+    )
+    return result
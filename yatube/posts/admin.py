@@ -1,16 +1,36 @@
 from django.contrib import admin
+from django.utils.html import format_html
+from sorl.thumbnail import get_thumbnail
 
 from posts.models import Follow, Post, Group, Comment
+from posts.search import get_search_backend
+from posts.thumbnails import THUMBNAIL_GEOMETRIES
 
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'image')
+    list_display = (
+        'pk', 'text', 'pub_date', 'author', 'group', 'image', 'image_preview'
+    )
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        found = get_search_backend().search(search_term).values('pk')
+        return queryset.filter(pk__in=found), False
+
+    def image_preview(self, obj):
+        if not obj.image:
+            return self.empty_value_display
+        geometry, options = THUMBNAIL_GEOMETRIES['admin']
+        thumbnail = get_thumbnail(obj.image, geometry, **options)
+        return format_html('<img src="{}">', thumbnail.url)
+    image_preview.short_description = 'Превью'
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -0,0 +1,166 @@
+"""
+JSON API лент только для чтения.
+
+Ленты собираются теми же querysets, что и HTML-страницы, и листаются
+курсором `?cursor=`. Ответы несут ETag (по версиям тегов кэша) и
+Last-Modified (по времени изменения тегов, только для анонимов),
+поэтому клиент может переспрашивать ленту условным GET и получать 304
+без тела.
+"""
+from django.http import (
+    HttpResponseForbidden, JsonResponse, StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
+
+from posts.caching import tags_etag, tags_last_modified
+from posts.models import Post, User
+from posts.paginators import KeysetPaginator
+from posts.services import (
+    NUM_POSTS_PER_PAGE, get_comments_page, get_feed_queryset, get_group,
+)
+from posts.timeline import TimelinePaginator
+from posts.transfer import export_records, ndjson_line
+
+
+def serialize_user(user):
+    return {
+        'username': user.username,
+        'full_name': user.get_full_name(),
+    }
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'updated': post.updated,
+        'author': serialize_user(post.author),
+        'group': post.group and {
+            'slug': post.group.slug,
+            'title': post.group.title,
+        },
+        'image': post.image.url if post.image else None,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created,
+        'author': comment.author.username,
+    }
+
+
+def _conditional(request, tags):
+    """
+    Возвращает (ответ 304 или None, заголовки для полного ответа).
+    Заголовки строятся по тегам и не требуют запросов к БД.
+    """
+    headers = {'ETag': tags_etag(request, tags)}
+    last_modified = tags_last_modified(request, tags)
+    timestamp = None
+    if last_modified is not None:
+        timestamp = int(last_modified.timestamp())
+        headers['Last-Modified'] = http_date(timestamp)
+    response = get_conditional_response(
+        request, etag=headers['ETag'], last_modified=timestamp
+    )
+    if response is not None:
+        for header, value in headers.items():
+            response[header] = value
+    return response, headers
+
+
+def _json(data, headers):
+    response = JsonResponse(data)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def feed_response(request, post_list, *tags, paginator=None):
+    """
+    Отдаёт страницу ленты post_list (или страницу paginator, если ленте
+    нужен свой) с поддержкой условного GET.
+    """
+    not_modified, headers = _conditional(request, ('posts', 'groups') + tags)
+    if not_modified is not None:
+        return not_modified
+    paginator = paginator or KeysetPaginator(
+        get_feed_queryset(post_list), NUM_POSTS_PER_PAGE
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    return _json({
+        'results': [serialize_post(post) for post in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }, headers)
+
+
+@require_GET
+def index(request):
+    """Лента всех постов"""
+    return feed_response(request, Post.objects.all())
+
+
+@require_GET
+def group_posts(request, slug):
+    """Лента постов группы"""
+    group = get_group(slug)
+    return feed_response(request, group.posts.all(), f'group:{group.pk}')
+
+
+@require_GET
+def profile(request, username):
+    """Лента постов автора"""
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.all(), f'author:{author.pk}')
+
+
+@require_GET
+def follow_index(request):
+    """Лента постов авторов, на которых подписан пользователь"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Требуется вход'}, status=403)
+    return feed_response(
+        request,
+        None,
+        f'following:{request.user.pk}',
+        paginator=TimelinePaginator(request.user, NUM_POSTS_PER_PAGE),
+    )
+
+
+@require_GET
+def post_detail(request, post_id):
+    """Пост и первая (или следующая за курсором) порция комментариев"""
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    not_modified, headers = _conditional(
+        request,
+        ('groups', f'post:{post.pk}', f'author:{post.author_id}'),
+    )
+    if not_modified is not None:
+        return not_modified
+    comments = get_comments_page(post.pk, request.GET.get('cursor'))
+    return _json({
+        'post': serialize_post(post),
+        'comments': [serialize_comment(comment) for comment in comments],
+        'next_cursor': comments.next_cursor,
+    }, headers)
+
+
+@require_GET
+def export_posts(request):
+    """Выгрузка всех постов потоком NDJSON, только для персонала"""
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    return StreamingHttpResponse(
+        (ndjson_line(record) for record in export_records('posts')),
+        content_type='application/x-ndjson',
+    )
@@ -0,0 +1,183 @@
+"""
+Нагрузочный прогон лент Yatube.
+
+seed() наполняет базу синтетическими данными, run() прогоняет страницы
+через тестовый клиент Django и считает задержки, SQL-запросы и RPS.
+Результаты можно сохранить в JSON и сравнить с прогоном другого коммита.
+
+И наполнение, и прогон работают с отдельным кэшем в памяти процесса
+(BENCHMARK_CACHES): синтетические страницы не попадают в рабочий кэш под
+теми же ключами, а холодный прогон очищает только свой кэш.
+"""
+import random
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from faker import Faker
+from mixer.backend.django import mixer
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.stats import rebuild_stats
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+PERCENTILES = (50, 95, 99)
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    },
+}
+
+
+def isolated_cache():
+    """Подменяет кэши на BENCHMARK_CACHES на время прогона."""
+    return override_settings(CACHES=BENCHMARK_CACHES)
+
+
+def seed(users=50, groups=5, posts=1000, follows=10, comments=2000,
+         images=20, random_seed=0):
+    """
+    Создаёт синтетический набор данных. Посты и комментарии пишутся
+    пачками, поэтому статистика профилей пересчитывается в конце.
+    """
+    with isolated_cache():
+        _seed(users, groups, posts, follows, comments, images, random_seed)
+
+
+def _seed(users, groups, posts, follows, comments, images, random_seed):
+    rng = random.Random(random_seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(random_seed)
+    authors = mixer.cycle(users).blend(
+        User, username=mixer.sequence('bench_user_{0}')
+    )
+    group_list = mixer.cycle(groups).blend(
+        Group, slug=mixer.sequence('bench-group-{0}')
+    )
+    image_names = [
+        default_storage.save(f'posts/bench_{i}.gif', ContentFile(SMALL_GIF))
+        for i in range(images)
+    ]
+    Post.objects.bulk_create((
+        Post(
+            author=rng.choice(authors),
+            group=rng.choice(group_list + [None]),
+            text=fake.text(max_nb_chars=300),
+            image=image_names[i] if i < images else '',
+        ) for i in range(posts)
+    ), batch_size=500)
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    Comment.objects.bulk_create((
+        Comment(
+            post_id=rng.choice(post_ids),
+            author=rng.choice(authors),
+            text=fake.sentence(),
+        ) for _ in range(comments)
+    ), batch_size=500)
+    # Подписки создаются по одной: сигналы заполняют ленты подписок.
+    for user in authors:
+        others = [author for author in authors if author != user]
+        for author in rng.sample(others, min(follows, len(others))):
+            Follow.objects.create(user=user, author=author)
+    rebuild_stats()
+
+
+def get_scenarios():
+    """Страницы прогона: имя -> (url, пользователь или None)."""
+    group = Group.objects.order_by('pk').first()
+    busiest_author = User.objects.order_by(
+        '-stats__posts_count', 'pk'
+    ).first()
+    busiest_post = Post.objects.annotate(
+        comments_total=Count('comments')
+    ).order_by('-comments_total', 'pk').first()
+    follower = User.objects.order_by('-stats__following_count', 'pk').first()
+    return {
+        'index': (reverse('posts:index'), None),
+        'group_posts': (
+            reverse('posts:group_posts', args=[group.slug]), None
+        ),
+        'profile': (
+            reverse('posts:profile', args=[busiest_author.username]), None
+        ),
+        'post_detail': (
+            reverse('posts:post_detail', args=[busiest_post.pk]), None
+        ),
+        'follow_index': (reverse('posts:follow_index'), follower),
+    }
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(int(round(percent / 100 * len(ordered))) - 1, 0)
+    return ordered[rank]
+
+
+def measure(url, user=None, requests=100, cold=False):
+    """
+    Запрашивает url requests раз. При cold кэш очищается перед каждым
+    запросом, и страница каждый раз отрисовывается заново. Вызывать
+    только внутри isolated_cache(), как это делает run().
+    """
+    if settings.CACHES != BENCHMARK_CACHES:
+        raise RuntimeError('Прогон запущен на рабочем кэше')
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    latencies = []
+    queries = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} вернул {response.status_code}')
+        queries.append(len(captured))
+    elapsed = time.perf_counter() - started
+    result = {
+        f'p{percent}': percentile(latencies, percent)
+        for percent in PERCENTILES
+    }
+    result['queries'] = sum(queries) / len(queries)
+    result['rps'] = requests / elapsed
+    return result
+
+
+def run(requests=100, cold=False):
+    """Прогоняет все сценарии и возвращает их метрики."""
+    with isolated_cache():
+        return {
+            name: measure(url, user, requests, cold)
+            for name, (url, user) in get_scenarios().items()
+        }
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
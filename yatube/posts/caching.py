@@ -0,0 +1,216 @@
+"""
+Кэширование страниц с инвалидацией по тегам.
+
+Страница кэшируется вместе с версиями тегов, от которых она зависит
+(`posts`, `group:<id>`, `author:<id>`, `post:<id>`, `following:<id>`).
+Изменение модели увеличивает версию её тегов, и все зависящие от них
+страницы перестают совпадать с кэшем; PAGE_CACHE_TIMEOUT лишь не даёт
+забытым страницам копиться. Ключ страницы строится только из пути и
+известных параметров (PAGE_PARAMS), поэтому посторонние параметры
+запроса не заводят новых записей. Пока одна страница пересчитывается,
+остальные запросы к ней ждут результат, а не рендерят её параллельно.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+
+from core.metrics import record_cache
+
+TAG_KEY_PREFIX = 'cache_tag:'
+TAG_TIME_KEY_PREFIX = 'cache_tag_time:'
+PAGE_KEY_PREFIX = 'tagged_page:'
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+# Параметры запроса, от которых зависят кэшируемые страницы.
+PAGE_PARAMS = ('page', 'cursor')
+LOCK_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+WAIT_ATTEMPTS = 40
+
+
+def _tag_key(tag):
+    return TAG_KEY_PREFIX + tag
+
+
+def _new_version():
+    # Версия от времени не повторяет уже выданные, даже если
+    # старое значение было вытеснено из кэша.
+    return time.time_ns()
+
+
+def get_tag_versions(tags):
+    """Возвращает текущие версии тегов, заводя недостающие."""
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def _tag_time_key(tag):
+    return TAG_TIME_KEY_PREFIX + tag
+
+
+def _bump(tags):
+    for tag in tags:
+        try:
+            cache.incr(_tag_key(tag))
+        except ValueError:
+            cache.set(_tag_key(tag), _new_version(), None)
+    # Время изменения тега — для Last-Modified, см. tags_last_modified().
+    now = time.time()
+    cache.set_many({_tag_time_key(tag): now for tag in tags}, None)
+
+
+def bump_tags(*tags):
+    """
+    Инвалидирует страницы, зависящие от тегов. Внутри транзакции версия
+    поднимается ещё раз после коммита, чтобы страница, отрисованная по
+    незакоммиченным данным, не осталась в кэше.
+    """
+    _bump(tags)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(tags))
+
+
+def add_cache_tags(request, *tags):
+    """
+    Отмечает, что кэшируемая страница зависит от тегов. Вызывать нужно
+    до чтения данных, к которым относятся теги.
+    """
+    page_tags = getattr(request, '_cache_tags', None)
+    if page_tags is not None:
+        page_tags.update(get_tag_versions(tags))
+
+
+def tags_etag(request, tags):
+    """
+    ETag ответа, который зависит только от тегов: он меняется при любом
+    изменении данных страницы, в том числе удалении, и не требует
+    запросов к БД.
+    """
+    versions = sorted(get_tag_versions(tags).items())
+    raw = f'{_page_path(request)}|{request.user.pk}|{versions}'
+    return '"' + hashlib.md5(raw.encode()).hexdigest() + '"'
+
+
+def tags_last_modified(request, tags):
+    """
+    Last-Modified ответа, который зависит от тегов: время последнего
+    изменения любого из них. Правки, удаления, комментарии и подписки
+    поднимают теги, поэтому это время учитывает их все, в отличие от
+    дат в самих данных. Возвращает None, если дату отдавать нельзя:
+    для вошедшего пользователя (страница зависит от него, а дата — нет)
+    и пока не закончилась секунда последнего изменения (If-Modified-Since
+    точен до секунды).
+    """
+    if request.user.is_authenticated:
+        return None
+    keys = [_tag_time_key(tag) for tag in tags]
+    found = cache.get_many(keys)
+    now = time.time()
+    # Время вытеснено из кэша или ещё не заведено — считаем, что тег
+    # изменился только что.
+    missing = {key: now for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    newest = int(max(found.values()))
+    if newest >= int(now):
+        return None
+    return datetime.fromtimestamp(newest, timezone.utc)
+
+
+def _page_path(request):
+    """Путь запроса только с параметрами из PAGE_PARAMS."""
+    params = []
+    for name in PAGE_PARAMS:
+        value = request.GET.get(name)
+        if name == 'page' and value is not None:
+            # ?page=01, ?page=1, ?page=abc и запрос без номера —
+            # одна и та же первая страница.
+            value = str(int(value)) if value.isdigit() else ''
+            if value == '1':
+                value = ''
+        if value:
+            params.append(f'{name}={value}')
+    return request.path + ('?' + '&'.join(params) if params else '')
+
+
+def _page_key(request):
+    raw = f'{_page_path(request)}|{request.user.pk}'.encode()
+    return PAGE_KEY_PREFIX + hashlib.md5(raw).hexdigest()
+
+
+def _cached_response(key):
+    entry = cache.get(key)
+    if entry is None or get_tag_versions(entry['tags']) != entry['tags']:
+        record_cache(misses=1)
+        return None
+    record_cache(hits=1)
+    return HttpResponse(entry['content'], content_type=entry['content_type'])
+
+
+def _is_cacheable(response):
+    return response.status_code == 200 and not response.cookies
+
+
+def _single_flight(key, render):
+    """
+    Отрисовывает страницу только в одном запросе: остальные ждут, пока
+    она появится в кэше, и рендерят сами, лишь если ожидание затянулось.
+    """
+    lock_key = key + ':lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            return render()
+        finally:
+            cache.delete(lock_key)
+    for _ in range(WAIT_ATTEMPTS):
+        time.sleep(WAIT_INTERVAL)
+        response = _cached_response(key)
+        if response is not None:
+            return response
+    return render()
+
+
+def cache_page_by_tags(*tags, anonymous_only=False):
+    """
+    Кэширует ответ GET-запроса до изменения любого из тегов страницы.
+
+    Теги из аргументов относятся ко всей странице, остальные view
+    добавляет через add_cache_tags(). Ответ кэшируется отдельно для
+    каждого пользователя.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or (
+                anonymous_only and request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+            key = _page_key(request)
+            response = _cached_response(key)
+            if response is not None:
+                return response
+
+            def render():
+                request._cache_tags = get_tag_versions(tags)
+                response = view(request, *args, **kwargs)
+                if _is_cacheable(response):
+                    cache.set(key, {
+                        'tags': request._cache_tags,
+                        'content': response.content,
+                        'content_type': response['Content-Type'],
+                    }, PAGE_CACHE_TIMEOUT)
+                return response
+
+            return _single_flight(key, render)
+        return wrapper
+    return decorator
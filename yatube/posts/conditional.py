@@ -0,0 +1,70 @@
+"""
+Условный GET для HTML-страниц лент.
+
+Для каждой страницы определяются теги кэша, от которых она зависит.
+Из их версий строится ETag (он учитывает и правки, и удаления, и
+пользователя), из времени их последнего изменения — Last-Modified
+(только для анонимов, см. tags_last_modified). Даты самих постов для
+этого не годятся: удаление поста или новая подписка их не двигают.
+Если клиент или CDN присылает совпадающий If-None-Match /
+If-Modified-Since, ответ 304 отдаётся без вызова view и отрисовки
+шаблона.
+"""
+from django.views.decorators.http import condition
+
+from posts.caching import tags_etag, tags_last_modified
+from posts.models import Post, User
+from posts.services import get_group
+
+
+def _state(request, compute, args, kwargs):
+    # etag_func и last_modified_func вызываются по очереди: считаем
+    # теги страницы один раз на запрос.
+    if not hasattr(request, '_conditional_state'):
+        request._conditional_state = compute(request, *args, **kwargs)
+    return request._conditional_state
+
+
+def conditional_page(compute):
+    """
+    Декоратор условного GET. compute(request, *args, **kwargs) возвращает
+    теги страницы или None, если объекта нет.
+    """
+    def etag(request, *args, **kwargs):
+        tags = _state(request, compute, args, kwargs)
+        return tags and tags_etag(request, tags)
+
+    def last_modified(request, *args, **kwargs):
+        tags = _state(request, compute, args, kwargs)
+        return tags and tags_last_modified(request, tags)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def index_state(request):
+    return ('posts', 'groups')
+
+
+def group_state(request, slug):
+    group = get_group(slug)
+    return ('groups', f'group:{group.pk}')
+
+
+def profile_state(request, username):
+    # Подписка зрителя на автора меняет тег автора, а ETag строится
+    # отдельно для каждого пользователя: кнопка подписки не устареет.
+    pk = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if pk is None:
+        return None
+    return ('groups', f'author:{pk}')
+
+
+def post_detail_state(request, post_id):
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    return ('groups', f'post:{post_id}', f'author:{author_id}')
@@ -0,0 +1,125 @@
+"""
+Кэш графа подписок.
+
+Для каждого пользователя в кэше лежит множество id авторов, на которых
+он подписан, для каждого автора — число подписчиков. Подписка и
+отписка меняют их сразу, а после коммита транзакции граф сверяется с
+БД. Кнопка подписки и лента подписок читают граф без запросов к БД.
+"""
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from posts.models import Follow, ProfileStats
+
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+
+
+def _following_key(user_id):
+    return f'follow_graph:following:{user_id}'
+
+
+def _followers_key(author_id):
+    return f'follow_graph:followers:{author_id}'
+
+
+def _load_following(user_id):
+    return frozenset(Follow.objects.filter(user_id=user_id).values_list(
+        'author_id', flat=True
+    ))
+
+
+def get_following(user_id):
+    """Множество id авторов, на которых подписан пользователь."""
+    key = _following_key(user_id)
+    following = cache.get(key)
+    if following is None:
+        following = _load_following(user_id)
+        cache.set(key, following, FOLLOW_GRAPH_TIMEOUT)
+    return following
+
+
+def is_following(user, author_id):
+    """Подписан ли пользователь (возможно, анонимный) на автора."""
+    return user.is_authenticated and author_id in get_following(user.pk)
+
+
+def get_followers_counts(author_ids):
+    """Число подписчиков авторов: {id автора: число}."""
+    keys = {_followers_key(author_id): author_id for author_id in author_ids}
+    found = cache.get_many(keys)
+    counts = {keys[key]: count for key, count in found.items()}
+    missing = [author_id for key, author_id in keys.items()
+               if key not in found]
+    if missing:
+        loaded = dict(ProfileStats.objects.filter(
+            user_id__in=missing
+        ).values_list('user_id', 'followers_count'))
+        loaded = {author_id: loaded.get(author_id, 0)
+                  for author_id in missing}
+        cache.set_many({
+            _followers_key(author_id): count
+            for author_id, count in loaded.items()
+        }, FOLLOW_GRAPH_TIMEOUT)
+        counts.update(loaded)
+    return counts
+
+
+def _apply(user_id, author_ids, delta):
+    key = _following_key(user_id)
+    following = cache.get(key)
+    if following is not None:
+        if delta > 0:
+            following = following | set(author_ids)
+        else:
+            following = following - set(author_ids)
+        cache.set(key, following, FOLLOW_GRAPH_TIMEOUT)
+    for author_id in author_ids:
+        try:
+            cache.incr(_followers_key(author_id), delta)
+        except ValueError:
+            pass
+
+
+def _refresh(user_id, author_ids):
+    cache.set(
+        _following_key(user_id),
+        _load_following(user_id),
+        FOLLOW_GRAPH_TIMEOUT,
+    )
+    cache.delete_many([_followers_key(author_id) for author_id in author_ids])
+    get_followers_counts(author_ids)
+
+
+def follows_changed(user_id, author_ids, delta):
+    """
+    Учитывает подписку (delta=1) или отписку (delta=-1) пользователя
+    на авторов author_ids. Внутри транзакции граф ещё раз перечитывается
+    из БД после коммита, чтобы откат или гонка параллельных подписок не
+    оставили его неверным.
+    """
+    author_ids = list(author_ids)
+    _apply(user_id, author_ids, delta)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _refresh(user_id, author_ids))
+
+
+def follow_changed(user_id, author_id, delta):
+    """Учитывает подписку или отписку на одного автора."""
+    follows_changed(user_id, [author_id], delta)
+
+
+def forget(user_ids=(), author_ids=()):
+    """
+    Сбрасывает из кэша подписки пользователей user_ids и счётчики
+    подписчиков авторов author_ids: их изменили в обход follows_changed
+    (импорт, пересчёт счётчиков). Внутри транзакции ключи сбрасываются
+    ещё раз после коммита, чтобы параллельный запрос не вернул в кэш
+    старый граф.
+    """
+    keys = [_following_key(user_id) for user_id in user_ids]
+    keys += [_followers_key(author_id) for author_id in author_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
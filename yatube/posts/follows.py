@@ -0,0 +1,151 @@
+"""
+Массовые подписки и рекомендации «кого почитать».
+
+follow_many() подписывает на многих авторов одним bulk_create, а
+unfollow_many() отписывает одним DELETE; сигналы подписок при этом
+не срабатывают, их работа делается одним запросом на всю пачку.
+Рекомендации считаются по общим подпискам: авторы, на которых
+подписаны люди с похожими подписками. Их заранее пересчитывает команда
+`refresh_follow_suggestions`, страницы только читают готовый список.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from posts import follow_graph, timeline
+from posts.caching import bump_tags
+from posts.models import Follow, FollowSuggestion, ProfileStats, User
+from posts.stats import change_counters, rebuild_stats
+
+SUGGESTIONS_LIMIT = 20
+SUGGESTIONS_BATCH_SIZE = 500
+
+
+def follow_many(user, usernames):
+    """
+    Подписывает пользователя на авторов usernames. Возвращает username
+    авторов, подписка на которых появилась.
+    """
+    authors = dict(User.objects.filter(
+        username__in=set(usernames)
+    ).exclude(pk=user.pk).values_list('pk', 'username'))
+    with transaction.atomic():
+        existing = set(Follow.objects.filter(
+            user=user, author_id__in=authors
+        ).values_list('author_id', flat=True))
+        new_ids = set(authors) - existing
+        if not new_ids:
+            return []
+        # bulk_create не вызывает сигналы Follow: счётчики, ленты и
+        # кэши обновляем сами, по одному запросу на всю пачку.
+        Follow.objects.bulk_create(
+            [Follow(user=user, author_id=author_id) for author_id in new_ids],
+            ignore_conflicts=True,
+        )
+        updated = ProfileStats.objects.filter(user_id__in=new_ids).update(
+            followers_count=F('followers_count') + 1
+        )
+        if updated < len(new_ids):
+            rebuild_stats(User.objects.filter(pk__in=new_ids))
+        change_counters(user.pk, following_count=len(new_ids))
+        timeline.promote_pull_authors(new_ids)
+        for author_id in new_ids:
+            timeline.backfill_author(user.pk, author_id)
+        follow_graph.follows_changed(user.pk, new_ids, 1)
+        bump_tags(
+            f'following:{user.pk}',
+            *(f'author:{author_id}' for author_id in new_ids),
+        )
+    return sorted(authors[author_id] for author_id in new_ids)
+
+
+def unfollow_many(user, usernames):
+    """
+    Отписывает пользователя от авторов usernames. Возвращает username
+    авторов, от которых он отписался.
+    """
+    with transaction.atomic():
+        follows = Follow.objects.filter(
+            user=user, author__username__in=set(usernames)
+        )
+        authors = dict(follows.values_list('author_id', 'author__username'))
+        if not authors:
+            return []
+        # Подписки удаляются одним DELETE без сигналов Follow: счётчики,
+        # ленты и кэши обновляем сами, по одному запросу на всю пачку.
+        deleted = Follow.objects.filter(
+            user=user, author_id__in=authors
+        )._raw_delete(Follow.objects.db)
+        ProfileStats.objects.filter(user_id__in=authors).update(
+            followers_count=Greatest(F('followers_count') - 1, 0)
+        )
+        change_counters(user.pk, following_count=-deleted)
+        timeline.drop_authors(user.pk, list(authors))
+        follow_graph.follows_changed(user.pk, authors, -1)
+        bump_tags(
+            f'following:{user.pk}',
+            *(f'author:{author_id}' for author_id in authors),
+        )
+    return sorted(authors.values())
+
+
+def compute_suggestions(user_id, limit=SUGGESTIONS_LIMIT):
+    """
+    Авторы, на которых чаще всего подписаны те, кто подписан на тех же
+    авторов, что и пользователь: [(id автора, число общих подписок)].
+    """
+    following = Follow.objects.filter(user_id=user_id).values('author_id')
+    peers = Follow.objects.filter(
+        author_id__in=following
+    ).exclude(user_id=user_id).values('user_id')
+    return list(
+        Follow.objects.filter(user_id__in=peers)
+        .exclude(author_id__in=following)
+        .exclude(author_id=user_id)
+        .values('author_id')
+        .annotate(score=Count('user_id', distinct=True))
+        .order_by('-score', 'author_id')
+        .values_list('author_id', 'score')[:limit]
+    )
+
+
+def refresh_suggestions(users=None, batch_size=SUGGESTIONS_BATCH_SIZE):
+    """
+    Пересчитывает рекомендации пачками по batch_size пользователей,
+    у которых есть подписки. Возвращает число пересчитанных.
+    """
+    if users is None:
+        users = User.objects.filter(follower__isnull=False).distinct()
+    user_ids = users.order_by('pk').values_list('pk', flat=True)
+    refreshed = 0
+    last_pk = 0
+    while True:
+        batch = list(user_ids.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return refreshed
+        suggestions = [
+            FollowSuggestion(user_id=user_id, author_id=author_id,
+                             score=score)
+            for user_id in batch
+            for author_id, score in compute_suggestions(user_id)
+        ]
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(user_id__in=batch).delete()
+            FollowSuggestion.objects.bulk_create(suggestions)
+        refreshed += len(batch)
+        last_pk = batch[-1]
+
+
+def get_suggestions(user, limit=SUGGESTIONS_LIMIT):
+    """
+    Готовые рекомендации пользователя без авторов, на которых он успел
+    подписаться после пересчёта.
+    """
+    following = follow_graph.get_following(user.pk)
+    suggestions = FollowSuggestion.objects.filter(
+        user=user
+    ).select_related('author')
+    return [
+        suggestion for suggestion in suggestions[:limit + len(following)]
+        if suggestion.author_id not in following
+    ][:limit]
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from posts.images import ingest_upload, validate_upload
 from posts.models import Comment, Post
 
 
@@ -20,6 +22,24 @@ class PostForm(forms.ModelForm):
             )
         return data
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            validate_upload(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit=False)
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            # Файл сохраняется под именем из хеша содержимого, и модель
+            # получает уже готовое имя.
+            post.image = ingest_upload(image)
+        if commit:
+            post.save()
+            self._save_m2m()
+        return post
+
 
 class CommentForm(forms.ModelForm):
 
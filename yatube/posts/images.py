@@ -0,0 +1,190 @@
+"""
+Приём картинок постов.
+
+В запросе картинка только проверяется по заголовку (формат, размер
+файла и число пикселей) и сохраняется как есть под именем из SHA-256
+содержимого: повторная загрузка того же файла не пишет его на диск
+второй раз. Большие файлы Django уже принимает во временный файл
+кусками, в память они не читаются.
+
+Исходник лежит в UPLOAD_DIR, вне публичных каталогов MEDIA_ROOT: в
+нём может быть EXIF с координатами съёмки. Тяжёлая часть —
+декодирование, уменьшение до IMAGE_MAX_SIDE, удаление EXIF и
+перекодирование (при POST_IMAGE_FORMAT='WEBP' — в WebP) — выполняется
+пулом потоков `generate_thumbnails` перед созданием миниатюр, поэтому
+миниатюры режутся уже из уменьшенной картинки. Результат кладётся в
+публичный PUBLIC_DIR, а исходник сразу удаляется.
+"""
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from posts import media
+from posts.models import ImageUpload, Post
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+# Защита от «бомб»: маленький файл, который распаковывается в гигабайты.
+IMAGE_MAX_PIXELS = 50_000_000
+IMAGE_MAX_SIDE = 1920
+IMAGE_QUALITY = 85
+IMAGE_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+}
+# Загруженные, но ещё не пережатые картинки (не отдаются по MEDIA_URL).
+UPLOAD_DIR = 'uploads/'
+PUBLIC_DIR = 'posts/'
+
+
+def validate_upload(upload):
+    """
+    Проверяет картинку по заголовку, не декодируя её. upload — файл из
+    forms.ImageField, у которого уже есть открытый заголовок upload.image.
+    """
+    if upload.size > IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            f'Картинка должна быть не больше '
+            f'{IMAGE_MAX_UPLOAD_SIZE // (1024 * 1024)} МБ'
+        )
+    if upload.image.format not in IMAGE_EXTENSIONS:
+        raise ValidationError('Поддерживаются картинки JPEG, PNG, GIF и WebP')
+    width, height = upload.image.size
+    if width * height > IMAGE_MAX_PIXELS:
+        raise ValidationError('Слишком большое разрешение картинки')
+
+
+def content_hash(file):
+    """SHA-256 файла, прочитанного кусками."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def ingest_upload(upload):
+    """
+    Сохраняет загруженную картинку и возвращает её имя в хранилище.
+    Если такой файл уже загружали, возвращает имя существующего.
+    """
+    digest = content_hash(upload)
+    existing = ImageUpload.objects.filter(
+        content_hash=digest
+    ).values_list('image', flat=True).first()
+    if existing:
+        with transaction.atomic():
+            # Сборщик мусора либо уже удалил файл, либо после touch()
+            # его не тронет.
+            media.touch(existing)
+            if default_storage.exists(existing):
+                return existing
+    extension = IMAGE_EXTENSIONS[Image.open(upload).format]
+    upload.seek(0)
+    # Хранилище само назовёт файл по хешу и не запишет его повторно.
+    name = default_storage.save(f'{UPLOAD_DIR}upload{extension}', upload)
+    media.touch(name)
+    ImageUpload.objects.update_or_create(
+        content_hash=digest,
+        defaults={'image': name, 'processed': False},
+    )
+    return name
+
+
+def _target_format(source_format):
+    target = settings.POST_IMAGE_FORMAT or source_format
+    if target == 'WEBP' and not features.check('webp'):
+        logger.warning('Pillow собран без WebP, формат картинки не меняется')
+        return source_format
+    return target
+
+
+def reencode(image, target_format):
+    """
+    Уменьшает картинку до IMAGE_MAX_SIDE, поворачивает по EXIF и
+    перекодирует без EXIF. Возвращает байты или None, если картинку
+    трогать незачем (уже подходит или анимирована).
+    """
+    if getattr(image, 'is_animated', False):
+        return None
+    if (max(image.size) <= IMAGE_MAX_SIDE
+            and 'exif' not in image.info
+            and target_format == image.format):
+        return None
+    # JPEG декодируется сразу в уменьшенном масштабе.
+    image.draft('RGB', (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+    icc_profile = image.info.get('icc_profile')
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+    image.info.pop('exif', None)
+    if target_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    options = {'quality': IMAGE_QUALITY, 'optimize': True}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    image.save(buffer, target_format, **options)
+    return buffer.getvalue()
+
+
+def _public_name(name, extension):
+    """Имя в PUBLIC_DIR для файла name из UPLOAD_DIR."""
+    return PUBLIC_DIR + os.path.splitext(os.path.basename(name))[0] + extension
+
+
+def _move_posts(name, new_name):
+    moved = Post.objects.filter(image=name).update(image=new_name)
+    media.change_refs(new_name, moved)
+    return moved
+
+
+def normalize_image(name):
+    """
+    Пережимает загруженную картинку name из UPLOAD_DIR, если она ещё не
+    пережата, и кладёт результат в PUBLIC_DIR; посты переводятся на
+    новый файл, исходник удаляется. Возвращает имя итогового файла.
+    """
+    if not name.startswith(UPLOAD_DIR):
+        return name
+    upload = ImageUpload.objects.filter(image=name, processed=False).first()
+    if upload is None:
+        # Исходник уже пережат, а пост сохранили с его именем, пока
+        # картинку обрабатывал другой поток: переводим и этот пост.
+        digest = os.path.splitext(os.path.basename(name))[0]
+        new_name = ImageUpload.objects.filter(
+            content_hash=digest, processed=True
+        ).values_list('image', flat=True).first()
+        if new_name:
+            _move_posts(name, new_name)
+            return new_name
+        return name
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        target_format = _target_format(image.format)
+        data = reencode(image, target_format)
+        if data is None:
+            # Картинка уже подходит: переносим её как есть.
+            file.seek(0)
+            data = file.read()
+    new_name = default_storage.save(
+        _public_name(name, IMAGE_EXTENSIONS[target_format]),
+        ContentFile(data),
+    )
+    ImageUpload.objects.filter(pk=upload.pk).update(
+        image=new_name, processed=True
+    )
+    _move_posts(name, new_name)
+    media.delete_files([name])
+    return new_name
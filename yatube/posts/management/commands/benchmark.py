@@ -0,0 +1,120 @@
+import json
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from posts import benchmark
+
+HEADER = (
+    f'{"страница":<14}{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}'
+    f'{"запросов":>10}{"RPS":>10}'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет временную базу синтетическими данными и измеряет '
+        'задержки, SQL-запросы и RPS основных лент'
+    )
+
+    def add_arguments(self, parser):
+        for name, default, help_text in (
+            ('users', 50, 'Сколько создать пользователей'),
+            ('groups', 5, 'Сколько создать групп'),
+            ('posts', 1000, 'Сколько создать постов'),
+            ('follows', 10, 'На скольких авторов подписан пользователь'),
+            ('comments', 2000, 'Сколько создать комментариев'),
+            ('images', 20, 'У скольких постов будет картинка'),
+            ('requests', 100, 'Сколько запросов сделать к каждой странице'),
+            ('seed', 0, 'Зерно генератора данных'),
+        ):
+            parser.add_argument(
+                f'--{name}', type=int, default=default, help=help_text
+            )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--save',
+            help='Сохранить результаты в JSON-файл',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON-файл прошлого прогона для сравнения',
+        )
+
+    def handle(self, *args, **options):
+        # Данные создаются во временной базе и каталоге медиа, а кэш
+        # подменяется в benchmark.seed() и run(): рабочие база, медиа и
+        # кэш остаются нетронутыми.
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                benchmark.seed(
+                    users=options['users'],
+                    groups=options['groups'],
+                    posts=options['posts'],
+                    follows=options['follows'],
+                    comments=options['comments'],
+                    images=options['images'],
+                    random_seed=options['seed'],
+                )
+                results = benchmark.run(
+                    options['requests'], options['cold']
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(media_root, ignore_errors=True)
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+        self.report(results, baseline)
+        if options['save']:
+            with open(options['save'], 'w') as file:
+                json.dump({
+                    'commit': benchmark.current_commit(),
+                    'options': {
+                        key: options[key] for key in (
+                            'users', 'groups', 'posts', 'follows',
+                            'comments', 'images', 'requests', 'cold',
+                        )
+                    },
+                    'results': results,
+                }, file, indent=2)
+
+    def report(self, results, baseline=None):
+        self.stdout.write(HEADER)
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<14}{result["p50"]:>10.2f}{result["p95"]:>10.2f}'
+                f'{result["p99"]:>10.2f}{result["queries"]:>10.1f}'
+                f'{result["rps"]:>10.1f}'
+            )
+            previous = baseline and baseline['results'].get(name)
+            if previous:
+                self.stdout.write(
+                    f'{"  к базовому":<14}'
+                    + ''.join(
+                        f'{self.delta(result[key], previous[key]):>10}'
+                        for key in ('p50', 'p95', 'p99', 'queries', 'rps')
+                    )
+                )
+        if baseline:
+            self.stdout.write(
+                f'Базовый прогон: коммит {baseline.get("commit") or "?"}'
+            )
+
+    @staticmethod
+    def delta(value, previous):
+        if not previous:
+            return '—'
+        return f'{(value - previous) / previous:+.0%}'
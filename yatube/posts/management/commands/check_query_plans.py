@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.query_plans import check_feed_queries
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет через EXPLAIN, что запросы лент идут по индексам '
+        'без полного просмотра таблиц и сортировки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Печатать план каждого запроса',
+        )
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Завершаться с ошибкой, если найдены плохие планы',
+        )
+
+    def handle(self, *args, **options):
+        flagged = []
+        for name, (plan, problems) in check_feed_queries().items():
+            if problems:
+                flagged.append(name)
+                self.stdout.write(self.style.WARNING(f'{name}: ПЛОХО'))
+                for problem in problems:
+                    self.stdout.write(f'    {problem}')
+            else:
+                self.stdout.write(f'{name}: ok')
+            if options['verbose_plans']:
+                self.stdout.write(plan)
+        if flagged and options['strict']:
+            raise CommandError(
+                'Плохие планы запросов: ' + ', '.join(flagged)
+            )
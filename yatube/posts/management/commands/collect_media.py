@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from posts.media import MEDIA_GC_BATCH_SIZE, MEDIA_GC_GRACE, collect_garbage
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не ссылается ни один пост, вместе '
+        'с их миниатюрами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=MEDIA_GC_GRACE,
+            help='Не трогать файлы, изменённые меньше стольких секунд назад',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Обойти всё хранилище, а не только файлы с нулевым '
+                 'счётчиком ссылок',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет удалено',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MEDIA_GC_BATCH_SIZE,
+            help='Сколько файлов проверять за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        collected = collect_garbage(
+            grace=options['grace'],
+            full=options['full'],
+            dry_run=options['dry_run'],
+            batch_size=options['batch_size'],
+        )
+        if options['verbosity'] > 1 or options['dry_run']:
+            for name in collected:
+                self.stdout.write(name)
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} файлов: {len(collected)}'
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import FORMATS, KINDS, TRANSFER_BATCH_SIZE, export_file
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии или подписки в файл '
+        'NDJSON или CSV'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=KINDS)
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Формат файла; по умолчанию определяется по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=TRANSFER_BATCH_SIZE,
+            help='Сколько записей читать из БД за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            written = export_file(
+                options['kind'],
+                options['path'],
+                fmt=options['format'],
+                batch_size=options['batch_size'],
+            )
+        except OSError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено записей: {written}'
+        ))
@@ -0,0 +1,70 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post, ThumbnailJob
+from posts.thumbnails import THUMBNAIL_WORKERS, process_jobs
+
+BATCH_SIZE = 100
+POLL_INTERVAL = 2
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для картинок из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=THUMBNAIL_WORKERS,
+            help='Сколько картинок обрабатывать параллельно',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Поставить в очередь картинки всех постов',
+        )
+        parser.add_argument(
+            '--watch',
+            action='store_true',
+            help='Не завершаться, а ждать новые задачи',
+        )
+
+    def enqueue_all(self):
+        images = (
+            Post.objects.exclude(image='')
+            .order_by()
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        # Уже стоящие в очереди картинки пропускает INSERT OR IGNORE.
+        ThumbnailJob.objects.bulk_create(
+            (ThumbnailJob(image=image) for image in images.iterator()),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def drain(self, map_func, watch):
+        done = 0
+        while True:
+            processed = process_jobs(map_func, BATCH_SIZE)
+            done += processed
+            if processed:
+                self.stdout.write(f'Обработано картинок: {done}')
+            elif watch:
+                time.sleep(POLL_INTERVAL)
+            else:
+                return done
+
+    def handle(self, *args, **options):
+        if options['all']:
+            self.enqueue_all()
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(options['workers']) as executor:
+                done = self.drain(executor.map, options['watch'])
+        else:
+            done = self.drain(map, options['watch'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры созданы для картинок: {done}'
+        ))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import (
+    FORMATS, KINDS, TRANSFER_BATCH_SIZE, TransferError, import_file,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует группы, посты, комментарии или подписки из файла '
+        'NDJSON или CSV'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=KINDS)
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Формат файла; по умолчанию определяется по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=TRANSFER_BATCH_SIZE,
+            help='Сколько записей сохранять за одну транзакцию',
+        )
+        parser.add_argument(
+            '--source',
+            default='',
+            help=(
+                'Имя сайта, с которого выгружен файл: id записей разных '
+                'сайтов не смешиваются'
+            ),
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Продолжить импорт с контрольной точки',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            done = import_file(
+                options['kind'],
+                options['path'],
+                fmt=options['format'],
+                batch_size=options['batch_size'],
+                resume=options['resume'],
+                source=options['source'],
+                progress=lambda done: self.stdout.write(
+                    f'Импортировано записей: {done}'
+                ),
+            )
+        except (OSError, ValueError, TransferError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершён, записей: {done}'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from posts.stats import STATS_BATCH_SIZE, rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, подписок и комментариев профилей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=STATS_BATCH_SIZE,
+            help='Сколько профилей пересчитывать за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        fixed = rebuild_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено записей статистики: {fixed}'
+        ))
+        # Исправленное число подписчиков может сменить режим ленты автора.
+        call_command('refresh_pull_authors', stdout=self.stdout)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts.follows import SUGGESTIONS_BATCH_SIZE, refresh_suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации подписок по общим подпискам; '
+        'запускается периодически, например из cron'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SUGGESTIONS_BATCH_SIZE,
+            help='Скольким пользователям пересчитывать рекомендации за раз',
+        )
+
+    def handle(self, *args, **options):
+        refreshed = refresh_suggestions(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендации пересчитаны для пользователей: {refreshed}'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import refresh_pull_authors
+
+
+class Command(BaseCommand):
+    help = (
+        'Переключает авторов между раскладкой постов по лентам и чтением '
+        'при запросе по числу подписчиков (запускать по расписанию)'
+    )
+
+    def handle(self, *args, **options):
+        promoted, demoted = refresh_pull_authors()
+        self.stdout.write(self.style.SUCCESS(
+            f'Читаются при запросе: +{promoted}, снова раскладываются: '
+            f'{demoted}'
+        ))
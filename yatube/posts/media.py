@@ -0,0 +1,181 @@
+"""
+Учёт ссылок постов на медиафайлы и сборка мусора.
+
+Один файл может быть картинкой многих постов (одинаковые загрузки
+хранятся один раз), поэтому удалять его вместе с постом нельзя.
+Сигналы постов ведут в MediaFile число ссылок на каждый файл, а команда
+`collect_media` удаляет файлы, на которые давно никто не ссылается, —
+например, старую картинку после замены в post_edit. Перед удалением
+ссылки сверяются с постами: импорт и bulk_create идут мимо сигналов.
+
+Повторная загрузка уже лежащего файла не пишет его заново, поэтому она
+вызывает touch(): запись MediaFile (и время изменения файла) становится
+свежей, и сборщик не удалит файл, пока пост с ним сохраняется. Сборщик
+проверяет каждый файл заново в той же транзакции, в которой удаляет.
+"""
+import posixpath
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import ImageUpload, MediaFile, Post
+
+MEDIA_GC_GRACE = 60 * 60
+MEDIA_GC_BATCH_SIZE = 1000
+MEDIA_DIRS = ('posts', 'uploads')
+
+
+def change_refs(name, delta):
+    """Атомарно сдвигает число ссылок на файл name на delta."""
+    if not name:
+        return
+    with transaction.atomic():
+        updated = MediaFile.objects.filter(name=name).update(
+            refs=Greatest(F('refs') + delta, 0),
+            updated=timezone.now(),
+        )
+        if not updated and delta > 0:
+            # Строки ещё нет — считаем ссылки по постам.
+            MediaFile.objects.bulk_create([MediaFile(
+                name=name, refs=Post.objects.filter(image=name).count()
+            )], ignore_conflicts=True)
+
+
+def touch(name):
+    """
+    Отмечает, что файл name только что понадобился: сборщик мусора не
+    тронет его ещё grace секунд.
+    """
+    updated = MediaFile.objects.filter(name=name).update(
+        updated=timezone.now()
+    )
+    if not updated:
+        MediaFile.objects.bulk_create([MediaFile(
+            name=name, refs=Post.objects.filter(image=name).count()
+        )], ignore_conflicts=True)
+
+
+def _unreferenced(names):
+    referenced = Post.objects.filter(image__in=names).values_list(
+        'image', flat=True
+    )
+    return sorted(set(names) - set(referenced))
+
+
+def _recount(names):
+    """Исправляет счётчики файлов, на которые всё-таки ссылаются посты."""
+    counts = Post.objects.filter(image__in=names).values('image').annotate(
+        total=Count('pk')
+    ).values_list('image', 'total')
+    for name, total in counts:
+        MediaFile.objects.filter(name=name).update(refs=total)
+
+
+def delete_files(names):
+    """Удаляет файлы names вместе с миниатюрами и записями о них."""
+    for name in names:
+        delete_with_thumbnails(ImageFile(name, default_storage))
+    MediaFile.objects.filter(name__in=names).delete()
+    ImageUpload.objects.filter(image__in=names).delete()
+
+
+def _walk(directory):
+    directories, files = default_storage.listdir(directory)
+    for file_name in files:
+        yield posixpath.join(directory, file_name)
+    for subdirectory in directories:
+        yield from _walk(posixpath.join(directory, subdirectory))
+
+
+def _batches(names, batch_size):
+    batch = []
+    for name in names:
+        batch.append(name)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _orphan_candidates(cutoff, batch_size):
+    """Файлы без ссылок по счётчикам, пачками по первичному ключу."""
+    files = MediaFile.objects.filter(
+        refs=0, updated__lt=cutoff
+    ).order_by('pk').values_list('pk', 'name')
+    last_pk = 0
+    while True:
+        batch = list(files.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        yield [name for _, name in batch]
+        last_pk = batch[-1][0]
+
+
+def _stored_candidates(cutoff, batch_size):
+    """Все файлы хранилища старше cutoff, пачками."""
+    names = (
+        name
+        for directory in MEDIA_DIRS
+        if default_storage.exists(directory)
+        for name in _walk(directory)
+        if default_storage.get_modified_time(name) < cutoff
+    )
+    return _batches(names, batch_size)
+
+
+def _collect(name, cutoff, dry_run):
+    """
+    Удаляет файл name, если он по-прежнему никому не нужен. Транзакция
+    начинается с удаления старой записи MediaFile: это запись, поэтому
+    БД сразу блокирует её (SQLite — целиком), и параллельные touch() и
+    change_refs() того же файла ждут конца проверки. Возвращает True,
+    если файл удалён (при dry_run — был бы удалён).
+    """
+    with transaction.atomic():
+        MediaFile.objects.filter(name=name, updated__lt=cutoff).delete()
+        in_use = (
+            # Свежая запись осталась: файл только что загрузили снова
+            # или на него сослался пост.
+            MediaFile.objects.filter(name=name).exists()
+            or Post.objects.filter(image=name).exists()
+            or (default_storage.exists(name)
+                and default_storage.get_modified_time(name) >= cutoff)
+        )
+        if in_use or dry_run:
+            transaction.set_rollback(True)
+            return not in_use
+        delete_files([name])
+    return True
+
+
+def collect_garbage(grace=MEDIA_GC_GRACE, full=False, dry_run=False,
+                    batch_size=MEDIA_GC_BATCH_SIZE):
+    """
+    Удаляет файлы, на которые не ссылается ни один пост и которые не
+    менялись дольше grace секунд (чтобы не задеть только что
+    загруженный файл, пост которого ещё сохраняется). Обычно проверяются
+    только файлы с нулевым счётчиком; при full обходится всё хранилище.
+    Возвращает имена удалённых (при dry_run — подлежащих удалению).
+    """
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    if full:
+        candidates = _stored_candidates(cutoff, batch_size)
+    else:
+        candidates = _orphan_candidates(cutoff, batch_size)
+    collected = []
+    for batch in candidates:
+        orphans = [
+            name for name in _unreferenced(batch)
+            if _collect(name, cutoff, dry_run)
+        ]
+        if not dry_run and not full:
+            _recount(sorted(set(batch) - set(orphans)))
+        collected.extend(orphans)
+    return collected
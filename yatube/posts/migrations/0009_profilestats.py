@@ -0,0 +1,77 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:09
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def _count_subquery(model, field):
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def fill_profile_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    Comment = apps.get_model('posts', 'Comment')
+    ProfileStats = apps.get_model('posts', 'ProfileStats')
+    # Копия posts.stats.annotate_counters: миграция не импортирует код
+    # приложения, который меняется вместе с моделями.
+    users = User.objects.order_by().annotate(
+        posts_count=_count_subquery(Post, 'author'),
+        followers_count=_count_subquery(Follow, 'author'),
+        following_count=_count_subquery(Follow, 'user'),
+        comments_count=_count_subquery(Comment, 'author'),
+    ).values_list(
+        'pk', 'posts_count', 'followers_count', 'following_count',
+        'comments_count',
+    )
+    ProfileStats.objects.bulk_create(
+        (
+            ProfileStats(
+                user_id=user_id,
+                posts_count=posts_count,
+                followers_count=followers_count,
+                following_count=following_count,
+                comments_count=comments_count,
+            )
+            for (user_id, posts_count, followers_count, following_count,
+                 comments_count) in users.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0008_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+            ],
+            options={
+                'verbose_name': 'Статистика профиля',
+                'verbose_name_plural': 'Статистика профилей',
+            },
+        ),
+        migrations.RunPython(fill_profile_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_followsuggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageUpload',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True, verbose_name='SHA-256 загруженного файла')),
+                ('image', models.CharField(db_index=True, max_length=255, verbose_name='Файл')),
+                ('processed', models.BooleanField(default=False, verbose_name='Пережата')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата загрузки')),
+            ],
+            options={
+                'verbose_name': 'Загруженная картинка',
+                'verbose_name_plural': 'Загруженные картинки',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_media_files'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedObject',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20, verbose_name='Тип записей')),
+                ('source', models.CharField(blank=True, max_length=100, verbose_name='Источник')),
+                ('source_id', models.PositiveIntegerField(verbose_name='id в файле')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id в базе')),
+            ],
+            options={
+                'verbose_name': 'Импортированный объект',
+                'verbose_name_plural': 'Импортированные объекты',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importedobject',
+            constraint=models.UniqueConstraint(fields=('kind', 'source', 'source_id'), name='unique_imported_object'),
+        ),
+    ]
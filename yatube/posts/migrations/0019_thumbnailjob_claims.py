@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_imported_objects'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Неудачных попыток'),
+        ),
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата взятия в работу'),
+        ),
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Обработчик'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+# posts.timeline.FANOUT_FOLLOWERS_LIMIT на момент миграции.
+FANOUT_FOLLOWERS_LIMIT = 10000
+
+
+def mark_pull_authors(apps, schema_editor):
+    ProfileStats = apps.get_model('posts', 'ProfileStats')
+    ProfileStats.objects.filter(
+        followers_count__gte=FANOUT_FOLLOWERS_LIMIT
+    ).update(pull_feed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_thumbnailjob_claims'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profilestats',
+            name='pull_feed',
+            field=models.BooleanField(default=False, verbose_name='Посты читаются при запросе ленты'),
+        ),
+        migrations.RunPython(mark_pull_authors, migrations.RunPython.noop),
+    ]
@@ -5,6 +5,20 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
+class FullTextField(models.TextField):
+    """Столбец полнотекстового индекса с поддержкой lookup `match`."""
+
+
+@FullTextField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
 class Group(models.Model):
     title = models.CharField(
         'Название группы',
@@ -36,6 +50,10 @@ class Post(models.Model):
         auto_now_add=True,
         db_index=True,
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -61,6 +79,19 @@ class Post(models.Model):
         ordering = ('-pub_date', '-id',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_feed_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_feed_idx',
+            ),
+            models.Index(
+                fields=('image',),
+                name='post_image_idx',
+            )]
 
     def __str__(self):
         return self.text[:15]
@@ -93,6 +124,11 @@ class Comment(models.Model):
         ordering = ('-created', '-id',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_feed_idx',
+            )]
 
     def __str__(self):
         return self.text[:15]
@@ -120,6 +156,262 @@ class Follow(models.Model):
                 fields=('user', 'author'),
                 name='unique_follow',
             )]
+        indexes = [
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx',
+            )]
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(
+        'Дата публикации поста',
+    )
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_entry',
+            )]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_pub_date_idx',
+            )]
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user}'
+
+
+class ProfileStats(models.Model):
+    """Денормализованные счётчики профиля пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        'Постов',
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        'Подписок',
+        default=0,
+    )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+    )
+    pull_feed = models.BooleanField(
+        'Посты читаются при запросе ленты',
+        default=False,
+    )
+
+    class Meta:
+        verbose_name = 'Статистика профиля'
+        verbose_name_plural = 'Статистика профилей'
+
+    def __str__(self):
+        return f'Статистика {self.user}'
+
+
+class ThumbnailJob(models.Model):
+    """Картинка, для которой нужно создать миниатюры."""
+    image = models.CharField(
+        'Картинка',
+        max_length=255,
+        unique=True,
+    )
+    created = models.DateTimeField(
+        'Дата постановки в очередь',
+        auto_now_add=True,
+    )
+    claimed_by = models.CharField(
+        'Обработчик',
+        max_length=100,
+        blank=True,
+    )
+    claimed_at = models.DateTimeField(
+        'Дата взятия в работу',
+        blank=True,
+        null=True,
+    )
+    attempts = models.PositiveIntegerField(
+        'Неудачных попыток',
+        default=0,
+    )
+
+    class Meta:
+        ordering = ('pk',)
+        verbose_name = 'Задача на миниатюры'
+        verbose_name_plural = 'Задачи на миниатюры'
+
+    def __str__(self):
+        return self.image
+
+
+class FollowSuggestion(models.Model):
+    """Автор, которого стоит предложить пользователю для подписки."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name='Пользователь',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    score = models.PositiveIntegerField(
+        'Общих подписок',
+    )
+
+    class Meta:
+        ordering = ('-score', 'author')
+        verbose_name = 'Рекомендация подписки'
+        verbose_name_plural = 'Рекомендации подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow_suggestion',
+            )]
+
+    def __str__(self):
+        return f'{self.user} может подписаться на {self.author}'
+
+
+class PostSearchIndex(models.Model):
+    """
+    Полнотекстовый индекс текстов постов: виртуальная таблица FTS5,
+    которую триггеры SQLite синхронизируют с posts_post.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_index',
+    )
+    text = FullTextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
+
+
+class ImageUpload(models.Model):
+    """Загруженная картинка: хеш содержимого и файл, в котором она лежит."""
+    content_hash = models.CharField(
+        'SHA-256 загруженного файла',
+        max_length=64,
+        unique=True,
+    )
+    image = models.CharField(
+        'Файл',
+        max_length=255,
+        db_index=True,
+    )
+    processed = models.BooleanField(
+        'Пережата',
+        default=False,
+    )
+    created = models.DateTimeField(
+        'Дата загрузки',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Загруженная картинка'
+        verbose_name_plural = 'Загруженные картинки'
+
+    def __str__(self):
+        return self.image
+
+
+class MediaFile(models.Model):
+    """Медиафайл и число постов, которые на него ссылаются."""
+    name = models.CharField(
+        'Файл',
+        max_length=255,
+        unique=True,
+    )
+    refs = models.PositiveIntegerField(
+        'Ссылок',
+        default=0,
+    )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = 'Медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+        indexes = [
+            models.Index(
+                fields=('refs', 'updated'),
+                name='mediafile_gc_idx',
+            )]
+
+    def __str__(self):
+        return self.name
+
+
+class ImportedObject(models.Model):
+    """Объект, созданный импортом: id записи в файле и id в этой базе."""
+    kind = models.CharField(
+        'Тип записей',
+        max_length=20,
+    )
+    source = models.CharField(
+        'Источник',
+        max_length=100,
+        blank=True,
+    )
+    source_id = models.PositiveIntegerField(
+        'id в файле',
+    )
+    object_id = models.PositiveIntegerField(
+        'id в базе',
+    )
+
+    class Meta:
+        verbose_name = 'Импортированный объект'
+        verbose_name_plural = 'Импортированные объекты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('kind', 'source', 'source_id'),
+                name='unique_imported_object',
+            )]
+
+    def __str__(self):
+        return f'{self.kind} {self.source_id} -> {self.object_id}'
@@ -0,0 +1,164 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    """Курсор пагинации не удалось разобрать."""
+
+
+class KeysetPaginator(Paginator):
+    """
+    Пагинатор, выбирающий страницу по ключу крайней записи (seek method).
+
+    Вместо OFFSET запрос фильтруется по значениям полей сортировки
+    последней показанной записи, поэтому стоимость страницы не зависит
+    от её глубины. Положение в ленте передаётся непрозрачным курсором.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, per_page, ordering=None):
+        super().__init__(object_list, per_page)
+        self.ordering = self._get_ordering(ordering)
+
+    def _get_ordering(self, ordering):
+        """Возвращает список пар (поле, по убыванию) для сортировки."""
+        ordering = (
+            ordering
+            or self.object_list.query.order_by
+            or self.object_list.model._meta.ordering
+        )
+        fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+        if fields[-1][0] not in ('id', 'pk'):
+            # Последний ключ должен быть уникальным, иначе записи
+            # с одинаковой датой могут потеряться на границе страниц.
+            fields.append(('id', fields[0][1]))
+        return fields
+
+    def _get_field(self, name):
+        """Поле модели или None, если сортировка идёт по аннотации."""
+        opts = self.object_list.model._meta
+        if name == 'pk':
+            return opts.pk
+        try:
+            return opts.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def _dump_value(self, obj, name):
+        field = self._get_field(name)
+        if field is None:
+            return getattr(obj, name)
+        return field.value_to_string(obj)
+
+    def _load_value(self, name, value):
+        field = self._get_field(name)
+        if field is None:
+            return value
+        return field.to_python(value)
+
+    def encode_cursor(self, obj, direction):
+        values = [self._dump_value(obj, name) for name, _ in self.ordering]
+        data = json.dumps([direction, values]).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            data = base64.urlsafe_b64decode(cursor + padding)
+            direction, values = json.loads(data.decode())
+            if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS):
+                raise ValueError(direction)
+            if len(values) != len(self.ordering):
+                raise ValueError(values)
+            values = [
+                self._load_value(name, value)
+                for (name, _), value in zip(self.ordering, values)
+            ]
+        except Exception as error:
+            raise InvalidCursor(cursor) from error
+        return direction, values
+
+    def _seek_filter(self, values, direction):
+        """
+        Условие «строго после» (или «строго до») записи с ключом values
+        в лексикографическом порядке полей сортировки.
+        """
+        condition = Q()
+        for position, (name, descending) in enumerate(self.ordering):
+            forward = descending == (direction == CURSOR_NEXT)
+            lookup = 'lt' if forward else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[position]})
+            for prev_position in range(position):
+                prev_name = self.ordering[prev_position][0]
+                term &= Q(**{prev_name: values[prev_position]})
+            condition |= term
+        # Избыточная граница по первому полю превращает OR-условие в
+        # поиск диапазона по индексу вместо просмотра с начала ленты.
+        name, descending = self.ordering[0]
+        forward = descending == (direction == CURSOR_NEXT)
+        bound = Q(**{f'{name}__{"lte" if forward else "gte"}': values[0]})
+        return bound & condition
+
+    def _order_by(self, reverse=False):
+        return [
+            ('-' if descending != reverse else '') + name
+            for name, descending in self.ordering
+        ]
+
+    def _fetch(self, values, direction, limit):
+        """
+        Не больше limit записей после ключа values (или с начала ленты)
+        в порядке чтения: при CURSOR_PREVIOUS — в обратном.
+        """
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(values, direction))
+        backwards = direction == CURSOR_PREVIOUS
+        queryset = queryset.order_by(*self._order_by(reverse=backwards))
+        return list(queryset[:limit])
+
+    def _page_objects(self, rows):
+        """Объекты страницы по её записям."""
+        return rows
+
+    def page(self, cursor=None):
+        """Возвращает страницу, следующую за курсором (или первую)."""
+        direction, values = CURSOR_NEXT, None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        backwards = direction == CURSOR_PREVIOUS
+        rows = self._fetch(values, direction, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not rows and cursor:
+            return self.page()
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+        page = self._get_page(self._page_objects(rows), 1, self)
+        page.next_cursor = (
+            self.encode_cursor(rows[-1], CURSOR_NEXT) if has_next else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(rows[0], CURSOR_PREVIOUS)
+            if has_previous else None
+        )
+        return page
+
+    def get_page(self, cursor=None):
+        """Как page(), но при битом курсоре возвращает первую страницу."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
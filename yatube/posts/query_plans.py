@@ -0,0 +1,95 @@
+"""
+Проверка планов запросов лент через EXPLAIN.
+
+Запросы строятся теми же функциями, что и во view, и для первой, и для
+следующей по курсору страницы. План считается плохим, если таблица
+читается целиком (SCAN без индекса) или результат сортируется во
+временном B-дереве вместо чтения в порядке индекса.
+"""
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Post, User
+from posts.paginators import CURSOR_NEXT, KeysetPaginator
+from posts.services import (
+    NUM_COMMENTS_PER_PAGE, NUM_POSTS_PER_PAGE, get_feed_queryset,
+)
+from posts.timeline import TimelinePaginator
+
+# Значения, которые подставляются в запросы вместо реальных id.
+SAMPLE_ID = 1
+
+
+def _pages(paginator):
+    """Первая страница и страница после курсора."""
+    ordered = paginator.object_list.order_by(*paginator._order_by())
+    values = [timezone.now()] + [SAMPLE_ID] * (len(paginator.ordering) - 1)
+    seek = paginator._seek_filter(values, CURSOR_NEXT)
+    limit = paginator.per_page + 1
+    return ordered[:limit], ordered.filter(seek)[:limit]
+
+
+def get_feed_queries():
+    """Запросы лент: имя -> queryset."""
+    feeds = {
+        'index': get_feed_queryset(),
+        'group_posts': get_feed_queryset(
+            Post.objects.filter(group_id=SAMPLE_ID)
+        ),
+        'profile': get_feed_queryset(
+            Post.objects.filter(author_id=SAMPLE_ID)
+        ),
+    }
+    paginators = {
+        name: KeysetPaginator(queryset, NUM_POSTS_PER_PAGE)
+        for name, queryset in feeds.items()
+    }
+    # Лента подписок: записи ленты, посты pull-авторов и посты страницы.
+    paginators['follow_index'] = TimelinePaginator(
+        User(pk=SAMPLE_ID), NUM_POSTS_PER_PAGE
+    )
+    paginators['follow_index pull'] = KeysetPaginator(
+        Post.objects.filter(author_id=SAMPLE_ID).only('pub_date'),
+        NUM_POSTS_PER_PAGE,
+        ordering=('-pub_date', '-id'),
+    )
+    paginators['post_comments'] = KeysetPaginator(
+        Comment.objects.filter(post_id=SAMPLE_ID).select_related('author'),
+        NUM_COMMENTS_PER_PAGE,
+    )
+    queries = {}
+    for name, paginator in paginators.items():
+        first, following = _pages(paginator)
+        queries[name] = first
+        queries[f'{name} (курсор)'] = following
+    queries['follow_index posts'] = get_feed_queryset(
+        Post.objects.filter(pk__in=[SAMPLE_ID])
+    ).order_by()
+    queries['followers'] = Follow.objects.filter(
+        author_id=SAMPLE_ID
+    ).values_list('user_id', flat=True)
+    queries['following'] = Follow.objects.filter(
+        user_id=SAMPLE_ID
+    ).values_list('author_id', flat=True)
+    return queries
+
+
+def find_problems(plan):
+    """Строки плана SQLite с полным просмотром или сортировкой."""
+    problems = []
+    for line in plan.splitlines():
+        step = line.split(' ', 3)[-1]
+        full_scan = step.startswith('SCAN') and ' USING ' not in step
+        if full_scan or 'TEMP B-TREE' in step:
+            problems.append(step)
+    return problems
+
+
+def check_feed_queries():
+    """Возвращает {имя запроса: (план, список проблем)}."""
+    return {
+        name: (plan, find_problems(plan))
+        for name, plan in (
+            (name, queryset.explain())
+            for name, queryset in get_feed_queries().items()
+        )
+    }
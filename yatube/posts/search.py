@@ -0,0 +1,62 @@
+"""
+Полнотекстовый поиск по постам.
+
+Бэкенд задаётся настройкой POSTS_SEARCH_BACKEND. По умолчанию на SQLite
+используется индекс FTS5 (таблица posts_post_fts, её синхронизируют
+триггеры из миграции), на других БД — поиск подстрокой.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils.module_loading import import_string
+
+from posts.models import Post
+
+DEFAULT_SEARCH_BACKEND = 'posts.search.FTS5SearchBackend'
+
+
+def split_words(query):
+    return re.findall(r'\w+', query)
+
+
+class SimpleSearchBackend:
+    """Поиск постов, содержащих все слова запроса; новые посты выше."""
+
+    def search(self, query):
+        words = split_words(query)
+        if not words:
+            return Post.objects.none()
+        condition = Q()
+        for word in words:
+            condition &= Q(text__icontains=word)
+        return Post.objects.filter(condition)
+
+
+class FTS5SearchBackend(SimpleSearchBackend):
+    """
+    Поиск по индексу FTS5: каждое слово запроса ищется как префикс,
+    результаты упорядочены по релевантности (bm25).
+    """
+
+    @staticmethod
+    def build_query(words):
+        return ' '.join(
+            '"{}"*'.format(word.replace('"', '""')) for word in words
+        )
+
+    def search(self, query):
+        words = split_words(query)
+        if not words or connection.vendor != 'sqlite':
+            return super().search(query)
+        return Post.objects.filter(
+            search_index__text__match=self.build_query(words)
+        ).annotate(
+            search_rank=F('search_index__rank')
+        ).order_by('search_rank', '-pk')
+
+
+def get_search_backend():
+    backend = getattr(settings, 'POSTS_SEARCH_BACKEND', DEFAULT_SEARCH_BACKEND)
+    return import_string(backend)()
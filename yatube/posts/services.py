@@ -1,10 +1,95 @@
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db.models import Count
+from django.shortcuts import get_object_or_404
+
+from posts.caching import get_tag_versions
+from posts.models import Comment, Group, Post
+from posts.paginators import KeysetPaginator
 
 NUM_POSTS_PER_PAGE = 10
+NUM_COMMENTS_PER_PAGE = 20
+GROUP_CACHE_TIMEOUT = 60 * 60 * 24
+# Поля, которые нужны карточке поста в лентах.
+FEED_FIELDS = (
+    'text',
+    'pub_date',
+    'updated',
+    'image',
+    'author',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group',
+    'group__title',
+    'group__slug',
+)
+
+# Поля, которые нужны комментарию под постом.
+COMMENT_FIELDS = (
+    'text',
+    'created',
+    'post',
+    'author',
+    'author__username',
+)
+
+
+def get_group(slug):
+    """
+    Возвращает группу по slug из кэша. В ключ входит версия тега
+    `groups`, поэтому правка или удаление любой группы сбрасывает кэш.
+    """
+    version = get_tag_versions(['groups'])['groups']
+    key = f'group:{slug}:{version}'
+    group = cache.get(key)
+    if group is None:
+        group = get_object_or_404(Group, slug=slug)
+        cache.set(key, group, GROUP_CACHE_TIMEOUT)
+    return group
+
 
+def get_feed_queryset(post_list=None, with_comments_count=False):
+    """
+    Возвращает посты для ленты: автор и группа подтягиваются одним
+    запросом, из БД выбираются только поля, нужные карточке поста.
+    """
+    if post_list is None:
+        post_list = Post.objects.all()
+    post_list = post_list.select_related('author', 'group').only(
+        *FEED_FIELDS
+    )
+    if with_comments_count:
+        post_list = post_list.annotate(comments_count=Count('comments'))
+    return post_list
 
-def get_page_obj(request, list):
-    """Возращает объект Paginator'a"""
-    paginator = Paginator(list, NUM_POSTS_PER_PAGE)
+
+def get_page_obj(request, object_list, keyset_paginator=None):
+    """
+    Возращает страницу ленты.
+
+    По умолчанию лента листается курсором `?cursor=` (keyset-пагинация,
+    keyset_paginator — если ленте нужен свой), старые ссылки вида
+    `?page=N` обслуживает обычный Paginator по object_list.
+    """
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if page_number is not None:
+        paginator = Paginator(object_list, NUM_POSTS_PER_PAGE)
+        return paginator.get_page(page_number)
+    paginator = keyset_paginator or KeysetPaginator(
+        object_list, NUM_POSTS_PER_PAGE
+    )
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def get_comments_page(post_id, cursor=None):
+    """
+    Возвращает порцию комментариев поста, следующую за курсором.
+    Комментарии листаются только курсором: даже у поста с десятками
+    тысяч комментариев страница стоит один запрос.
+    """
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only(*COMMENT_FIELDS)
+    paginator = KeysetPaginator(comments, NUM_COMMENTS_PER_PAGE)
+    return paginator.get_page(cursor)
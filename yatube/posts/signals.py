@@ -0,0 +1,112 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from posts import follow_graph, media, timeline
+from posts.caching import bump_tags
+from posts.models import Comment, Follow, Group, Post, ProfileStats, User
+from posts.stats import change_counters
+from posts.thumbnails import schedule_thumbnails
+from posts.warmup import schedule_group_pages
+
+
+def _post_groups(post):
+    return {
+        group_id
+        for group_id in (post.group_id,
+                         getattr(post, '_previous_group_id', None))
+        if group_id
+    }
+
+
+def _post_tags(post):
+    tags = {'posts', f'author:{post.author_id}', f'post:{post.pk}'}
+    tags.update(f'group:{group_id}' for group_id in _post_groups(post))
+    return tags
+
+
+@receiver(post_save, sender=User)
+def create_profile_stats(sender, instance, created, **kwargs):
+    if created:
+        ProfileStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    if instance.pk:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        change_counters(instance.author_id, posts_count=1)
+        timeline.fan_out_post(instance)
+    image = instance.image.name
+    previous_image = getattr(instance, '_previous_image', None)
+    if image != previous_image:
+        media.change_refs(image, 1)
+        media.change_refs(previous_image, -1)
+        if image:
+            schedule_thumbnails(image)
+    bump_tags(*_post_tags(instance))
+    schedule_group_pages(*_post_groups(instance))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    change_counters(instance.author_id, posts_count=-1)
+    media.change_refs(instance.image.name, -1)
+    bump_tags(*_post_tags(instance))
+    schedule_group_pages(*_post_groups(instance))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        change_counters(instance.author_id, followers_count=1)
+        change_counters(instance.user_id, following_count=1)
+        follow_graph.follow_changed(instance.user_id, instance.author_id, 1)
+        timeline.promote_pull_authors([instance.author_id])
+        timeline.backfill_author(instance.user_id, instance.author_id)
+        bump_tags(
+            f'author:{instance.author_id}', f'following:{instance.user_id}'
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_counters(instance.author_id, followers_count=-1)
+    change_counters(instance.user_id, following_count=-1)
+    follow_graph.follow_changed(instance.user_id, instance.author_id, -1)
+    timeline.drop_author(instance.user_id, instance.author_id)
+    bump_tags(
+        f'author:{instance.author_id}', f'following:{instance.user_id}'
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        change_counters(instance.author_id, comments_count=1)
+    bump_tags(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    change_counters(instance.author_id, comments_count=-1)
+    bump_tags(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump_tags('groups', f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    schedule_group_pages(instance.pk)
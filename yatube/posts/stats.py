@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from posts import follow_graph
+from posts.models import Comment, Follow, Post, ProfileStats, User
+
+STATS_BATCH_SIZE = 1000
+# Счётчик профиля: (модель, поле со ссылкой на пользователя).
+COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+    'comments_count': (Comment, 'author'),
+}
+
+
+def _count_subquery(model, field):
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def annotate_counters(users):
+    """Добавляет к пользователям фактические значения счётчиков."""
+    return users.annotate(**{
+        name: _count_subquery(model, field)
+        for name, (model, field) in COUNTERS.items()
+    })
+
+
+def change_counters(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя на значения deltas."""
+    updates = {
+        name: Greatest(F(name) + delta, 0) for name, delta in deltas.items()
+    }
+    with transaction.atomic():
+        updated = ProfileStats.objects.filter(user_id=user_id).update(
+            **updates
+        )
+        if not updated and all(delta > 0 for delta in deltas.values()):
+            # Строки ещё нет — считаем её целиком по данным из БД.
+            rebuild_stats(User.objects.filter(pk=user_id))
+
+
+def _save_batch(rows):
+    stats = ProfileStats.objects.in_bulk([row['pk'] for row in rows])
+    created, changed, followers_changed = [], [], []
+    for row in rows:
+        counters = {name: row[name] for name in COUNTERS}
+        current = stats.get(row['pk'])
+        if current is None:
+            created.append(ProfileStats(user_id=row['pk'], **counters))
+            followers_changed.append(row['pk'])
+        elif any(
+            getattr(current, name) != value
+            for name, value in counters.items()
+        ):
+            if current.followers_count != row['followers_count']:
+                followers_changed.append(row['pk'])
+            for name, value in counters.items():
+                setattr(current, name, value)
+            changed.append(current)
+    with transaction.atomic():
+        ProfileStats.objects.bulk_create(created, ignore_conflicts=True)
+        ProfileStats.objects.bulk_update(changed, list(COUNTERS))
+        # Кэш графа хранит число подписчиков и не знает о пересчёте.
+        follow_graph.forget(author_ids=followers_changed)
+    return len(created) + len(changed)
+
+
+def rebuild_stats(users=None, batch_size=STATS_BATCH_SIZE):
+    """
+    Пересчитывает счётчики пачками по batch_size пользователей.
+    Возвращает число созданных или исправленных записей.
+    """
+    if users is None:
+        users = User.objects.all()
+    users = annotate_counters(users.order_by('pk')).values('pk', *COUNTERS)
+    fixed = 0
+    last_pk = 0
+    while True:
+        rows = list(users.filter(pk__gt=last_pk)[:batch_size])
+        if not rows:
+            return fixed
+        fixed += _save_batch(rows)
+        last_pk = rows[-1]['pk']
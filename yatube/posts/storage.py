@@ -0,0 +1,57 @@
+"""
+Хранилище медиафайлов с адресацией по содержимому.
+
+Файл сохраняется под именем из SHA-256 своего содержимого и кладётся
+во вложенные каталоги по первым символам хеша:
+posts/ab/cd/abcd…ef.jpg. Каталоги не разрастаются до миллионов файлов,
+а одинаковое содержимое хранится один раз: повторный save() возвращает
+имя уже лежащего файла и только обновляет время его изменения.
+"""
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+
+
+def hashed_name(name, digest):
+    """Имя файла name с хешем digest: каталог и расширение сохраняются."""
+    directory = os.path.dirname(name)
+    extension = os.path.splitext(name)[1].lower()
+    shards = [
+        digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+        for i in range(SHARD_DEPTH)
+    ]
+    return '/'.join(
+        part for part in (directory, *shards, digest + extension) if part
+    )
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, которое называет файлы по их содержимому."""
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        name = hashed_name(name, digest.hexdigest())
+        try:
+            # Файл уже есть: освежаем время изменения, чтобы сборщик
+            # мусора (collect_media --full) не счёл его давно забытым.
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass
+        # Пишем во временный файл рядом и атомарно переименовываем: если
+        # тот же файл одновременно сохраняет другой процесс, один просто
+        # заменит другой тем же содержимым.
+        temp_name = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        os.replace(self.path(temp_name), self.path(name))
+        return name
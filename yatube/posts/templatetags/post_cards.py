@@ -0,0 +1,54 @@
+import hashlib
+
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.metrics import record_cache
+from posts.thumbnails import CARD_VARIANTS, prefetch_thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/card_post.html'
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def card_cache_key(post):
+    """
+    Ключ карточки меняется вместе со всем, что в ней показывается:
+    постом, именем автора и картинкой.
+    """
+    author = post.author
+    version = '|'.join((
+        post.updated.isoformat(),
+        author.username,
+        author.get_full_name(),
+        post.image.name or '',
+    ))
+    digest = hashlib.md5(version.encode()).hexdigest()
+    return f'post_card:{post.pk}:{digest}'
+
+
+@register.simple_tag
+def render_cards(posts):
+    """
+    Возвращает пары (пост, html карточки). Готовые карточки страницы
+    достаются из кэша одним запросом, отрисовываются только недостающие;
+    миниатюры для них тоже достаются одним пакетом.
+    """
+    posts = list(posts)
+    keys = [card_cache_key(post) for post in posts]
+    cached = cache.get_many(keys)
+    record_cache(hits=len(cached), misses=len(keys) - len(cached))
+    missing = [
+        (post, key) for post, key in zip(posts, keys) if key not in cached
+    ]
+    prefetch_thumbnails([post for post, _ in missing], *CARD_VARIANTS)
+    rendered = {}
+    for post, key in missing:
+        rendered[key] = render_to_string(CARD_TEMPLATE, {'post': post})
+    if rendered:
+        cache.set_many(rendered, CARD_CACHE_TIMEOUT)
+        cached.update(rendered)
+    return [(post, mark_safe(cached[key])) for post, key in zip(posts, keys)]
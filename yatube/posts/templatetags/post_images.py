@@ -0,0 +1,38 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from posts.thumbnails import DEFAULT_WIDTH, responsive_thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, sizes, css_class='card-img my-2'):
+    """
+    Возвращает <img> картинки поста: варианты разной ширины в srcset,
+    чтобы телефон не скачивал картинку для широкого экрана, размеры
+    против сдвига вёрстки и ленивую загрузку.
+    """
+    if not image:
+        return ''
+    variants = responsive_thumbnails(image)
+    fallback = next(
+        (variant for variant in variants if variant.width >= DEFAULT_WIDTH),
+        variants[-1],
+    )
+    if len(variants) == 1:
+        return format_html(
+            '<img class="{}" src="{}" width="{}" height="{}" '
+            'loading="lazy" alt="">',
+            css_class, fallback.url, fallback.width, fallback.height,
+        )
+    srcset = format_html_join(
+        ', ', '{} {}w',
+        ((variant.url, variant.width) for variant in variants),
+    )
+    return format_html(
+        '<img class="{}" src="{}" srcset="{}" sizes="{}" width="{}" '
+        'height="{}" loading="lazy" alt="">',
+        css_class, fallback.url, srcset, sizes, fallback.width,
+        fallback.height,
+    )
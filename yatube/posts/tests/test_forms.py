@@ -1,12 +1,25 @@
+import hashlib
+import os
 import shutil
 import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
 
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 
-from posts.models import Comment, Group, Post, User
+from posts.images import ingest_upload, normalize_image
+from posts.media import collect_garbage
+from posts.storage import hashed_name
+from posts.models import (
+    Comment, Group, Post, ImageUpload, MediaFile, User,
+)
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -55,6 +68,9 @@ class PostsCreateFormsTests(TestCase):
             content=cls.small_gif,
             content_type='image/gif',
         )
+        cls.small_gif_name = hashed_name(
+            'uploads/small.gif', hashlib.sha256(cls.small_gif).hexdigest()
+        )
 
     @classmethod
     def tearDownClass(cls):
@@ -82,7 +98,7 @@ class PostsCreateFormsTests(TestCase):
             text='Тестовый пост!',
             group=1,
             author=self.user,
-            image='posts/small.gif'
+            image=self.small_gif_name
         ).exists())
 
     def test_edit_post(self):
@@ -106,7 +122,7 @@ class PostsCreateFormsTests(TestCase):
             text='Пост тестовый!',
             group=2,
             author=self.user,
-            image='posts/small2.gif'
+            image=self.small_gif_name
         ).exists())
 
     def test_add_comment(self):
@@ -129,3 +145,115 @@ class PostsCreateFormsTests(TestCase):
             post=self.post,
             author=self.user,
         ).exists())
+
+    def test_same_image_is_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом."""
+        for name in ('first.gif', 'second.gif'):
+            self.auth_client.post(reverse('posts:post_create'), data={
+                'text': 'Пост с картинкой!',
+                'image': SimpleUploadedFile(name, self.small_gif),
+            })
+        self.assertEqual(
+            set(Post.objects.filter(
+                text='Пост с картинкой!'
+            ).values_list('image', flat=True)),
+            {self.small_gif_name},
+        )
+        self.assertEqual(
+            os.listdir(os.path.dirname(
+                default_storage.path(self.small_gif_name)
+            )),
+            [os.path.basename(self.small_gif_name)],
+        )
+
+    @mock.patch('posts.images.IMAGE_MAX_UPLOAD_SIZE', 10)
+    def test_large_upload_is_rejected(self):
+        """Слишком большой файл не принимается."""
+        response = self.auth_client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с большой картинкой!',
+            'image': SimpleUploadedFile('big.gif', self.small_gif),
+        })
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка должна быть не больше 0 МБ'
+        )
+
+    def test_uploaded_image_is_reencoded(self):
+        """
+        Большая картинка уменьшается и теряет EXIF в фоне, а до этого
+        не отдается по MEDIA_URL.
+        """
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        buffer = BytesIO()
+        Image.new('RGB', (4000, 1000)).save(buffer, 'JPEG', exif=exif)
+        self.auth_client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с фотографией!',
+            'image': SimpleUploadedFile('photo.jpg', buffer.getvalue()),
+        })
+        name = Post.objects.get(text='Пост с фотографией!').image.name
+        self.assertEqual(
+            self.client.get(settings.MEDIA_URL + name).status_code, 404
+        )
+        new_name = normalize_image(name)
+        self.assertTrue(new_name.startswith('posts/'))
+        self.assertEqual(
+            Post.objects.get(text='Пост с фотографией!').image.name, new_name
+        )
+        with default_storage.open(new_name) as file:
+            image = Image.open(file)
+            self.assertEqual(image.size, (1920, 480))
+            self.assertNotIn('exif', image.info)
+        self.assertTrue(ImageUpload.objects.get(image=new_name).processed)
+        self.assertFalse(default_storage.exists(name))
+        self.assertEqual(collect_garbage(grace=0), [])
+
+    def test_reuploaded_image_is_not_collected(self):
+        """Повторная загрузка старого файла защищает его от сборщика."""
+        data = self.small_gif + b'?'
+        self.auth_client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой!',
+            'image': SimpleUploadedFile('old.gif', data),
+        })
+        post = Post.objects.get(text='Пост с картинкой!')
+        name = post.image.name
+        post.delete()
+        old = timezone.now() - timedelta(hours=2)
+        MediaFile.objects.filter(name=name).update(updated=old)
+        os.utime(default_storage.path(name), (old.timestamp(),) * 2)
+        self.assertEqual(
+            collect_garbage(grace=3600, dry_run=True), [name]
+        )
+        # Файл снова загружен, а пост с ним ещё не сохранён.
+        self.assertEqual(
+            ingest_upload(SimpleUploadedFile('again.gif', data)), name
+        )
+        self.assertEqual(collect_garbage(grace=3600), [])
+        self.assertNotIn(name, collect_garbage(grace=3600, full=True))
+        self.assertTrue(default_storage.exists(name))
+
+    def test_replaced_image_is_collected(self):
+        """Картинка, замененная при редактировании, удаляется сборщиком."""
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой!',
+            image=SimpleUploadedFile('old.gif', self.small_gif),
+        )
+        old_name = post.image.name
+        Post.objects.create(author=self.user, text='Копия!', image=old_name)
+        self.auth_client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            data={
+                'text': 'Пост с новой картинкой!',
+                'image': SimpleUploadedFile('new.gif', self.small_gif + b'!'),
+            },
+        )
+        self.assertEqual(collect_garbage(grace=0), [])
+        Post.objects.filter(text='Копия!').delete()
+        self.assertEqual(collect_garbage(grace=0), [old_name])
+        self.assertFalse(default_storage.exists(old_name))
+        new_name = Post.objects.get(pk=post.pk).image.name
+        self.assertNotIn(
+            new_name, collect_garbage(grace=0, full=True),
+            'Файл отредактированного поста не должен удаляться',
+        )
+        self.assertTrue(default_storage.exists(new_name))
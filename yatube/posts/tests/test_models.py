@@ -1,6 +1,21 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
 
-from posts.models import Group, Post, User
+from posts import follow_graph, timeline
+from posts.models import (
+    Comment, Follow, Group, MediaFile, Post, ProfileStats, TimelineEntry,
+    User,
+)
+from posts.transfer import TransferError, import_file
 
 
 class PostsModelTest(TestCase):
@@ -61,3 +76,182 @@ class PostsModelTest(TestCase):
                     self.assertEqual(model._meta.get_field(field).help_text,
                                      field_help_text[field],
                                      f'help_text {model} {field} неверен!')
+
+
+class ProfileStatsTest(TestCase):
+    """Тестирование денормализованных счётчиков профиля."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return ProfileStats.objects.get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='Пост!')
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        author_stats = self.stats(self.author)
+        reader_stats = self.stats(self.reader)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(reader_stats.following_count, 1)
+        self.assertEqual(reader_stats.comments_count, 1)
+
+        follow.delete()
+        post.delete()
+        author_stats = self.stats(self.author)
+        reader_stats = self.stats(self.reader)
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(reader_stats.following_count, 0)
+        self.assertEqual(reader_stats.comments_count, 0)
+
+    def test_rebuild_profile_stats_command(self):
+        """Команда rebuild_profile_stats исправляет разошедшиеся счётчики."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Пост!') for _ in range(3)
+        )
+        ProfileStats.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('rebuild_profile_stats', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(self.stats(self.author).posts_count, 3)
+        self.assertTrue(ProfileStats.objects.filter(user=self.reader).exists())
+
+
+class TransferTest(TestCase):
+    """Тестирование потокового импорта и экспорта."""
+    def setUp(self):
+        # Кэш не откатывается вместе с транзакцией теста.
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.directory = tempfile.mkdtemp()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        self.post = Post.objects.create(
+            author=self.author, group=group, text='Пост!'
+        )
+        Comment.objects.create(post=self.post, author=self.reader, text='Да')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_export_and_import_round_trip(self):
+        """Выгруженные данные загружаются обратно со связями и датами."""
+        kinds = ('groups', 'posts', 'comments', 'follows')
+        for kind, extension in zip(kinds, ('csv', 'ndjson') * 2):
+            call_command(
+                'export_data', kind, self.path(f'{kind}.{extension}'),
+                stdout=StringIO(),
+            )
+        pub_date = self.post.pub_date
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        for kind, extension in zip(kinds, ('csv', 'ndjson') * 2):
+            call_command(
+                'import_data', kind, self.path(f'{kind}.{extension}'),
+                batch_size=1, stdout=StringIO(),
+            )
+        post = Post.objects.get()
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(post.comments.get().author.username, 'reader')
+        reader = User.objects.get(username='reader')
+        self.assertEqual(reader.stats.following_count, 1)
+        self.assertEqual(reader.stats.comments_count, 1)
+        self.assertEqual(post.author.stats.posts_count, 1)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=reader, post=post).exists()
+        )
+
+    def test_import_resumes_from_checkpoint(self):
+        """Импорт с --resume продолжает с сохранённого смещения."""
+        path = self.path('posts.ndjson')
+        lines = [
+            json.dumps({'id': pk, 'author': 'author', 'text': f'Импорт {pk}'})
+            + '\n' for pk in (100, 101)
+        ]
+        with open(path, 'w') as file:
+            file.writelines(lines)
+        with open(path + '.checkpoint', 'w') as file:
+            json.dump({
+                'kind': 'posts', 'offset': len(lines[0].encode()), 'done': 1,
+            }, file)
+        call_command('import_data', 'posts', path, resume=True,
+                     stdout=StringIO())
+        self.assertFalse(Post.objects.filter(text='Импорт 100').exists())
+        self.assertTrue(Post.objects.filter(text='Импорт 101').exists())
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+    def test_import_rejects_malformed_date(self):
+        """Нераспознанная дата записи останавливает импорт с ошибкой."""
+        path = self.path('posts.ndjson')
+        with open(path, 'w') as file:
+            file.write(json.dumps(
+                {'id': 5, 'author': 'x', 'pub_date': 'garbage'}
+            ) + '\n')
+        with self.assertRaises(TransferError):
+            import_file('posts', path)
+        self.assertFalse(User.objects.filter(username='x').exists())
+
+    def test_import_into_populated_site(self):
+        """Записи с занятыми id получают новые id и не теряются."""
+        posts_path = self.path('posts.csv')
+        comments_path = self.path('comments.ndjson')
+        with open(posts_path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['id', 'author', 'text', 'image'])
+            writer.writerow(
+                [self.post.pk, 'newcomer', 'Чужой\nпост', 'posts/a.gif']
+            )
+        with open(comments_path, 'w') as file:
+            file.write(json.dumps({
+                'id': 1, 'post': self.post.pk, 'author': 'newcomer',
+                'text': 'К чужому посту',
+            }) + '\n')
+        for kind, path in (('posts', posts_path),
+                           ('comments', comments_path)):
+            for _ in range(2):
+                call_command('import_data', kind, path, stdout=StringIO())
+        imported = Post.objects.get(author__username='newcomer')
+        self.assertEqual(imported.text, 'Чужой\nпост')
+        self.assertEqual(self.post.comments.count(), 1)
+        self.assertEqual(imported.comments.get().text, 'К чужому посту')
+        self.assertEqual(
+            MediaFile.objects.get(name='posts/a.gif').refs, 1
+        )
+        # Подписчик автора не получает в ленту чужой пост.
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=imported).exists()
+        )
+
+    def test_import_follows_refreshes_follow_graph(self):
+        """Импорт подписок обновляет кэш графа и режим ленты авторов."""
+        newcomer = User.objects.create_user(username='newcomer')
+        self.assertFalse(follow_graph.is_following(newcomer, self.author.pk))
+        self.assertEqual(
+            follow_graph.get_followers_counts([self.author.pk]),
+            {self.author.pk: 1},
+        )
+        path = self.path('follows.ndjson')
+        with open(path, 'w') as file:
+            file.write(json.dumps(
+                {'user': 'newcomer', 'author': 'author'}
+            ) + '\n')
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 2):
+            call_command('import_data', 'follows', path, stdout=StringIO())
+        self.assertTrue(follow_graph.is_following(newcomer, self.author.pk))
+        self.assertEqual(
+            follow_graph.get_followers_counts([self.author.pk]),
+            {self.author.pk: 2},
+        )
+        self.assertTrue(timeline.is_pull_author(self.author.pk))
+        self.assertFalse(TimelineEntry.objects.filter(user=newcomer).exists())
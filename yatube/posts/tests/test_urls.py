@@ -1,7 +1,15 @@
-from django.test import Client, TestCase
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import Client, TestCase, override_settings
 
 from posts.models import Group, Post, User
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 
 class PostsURLTests(TestCase):
     """Тестирование URL приложения posts."""
@@ -89,3 +97,70 @@ class PostsURLTests(TestCase):
             with self.subTest(address=address):
                 response = self.guest_client.get(address)
                 self.assertEqual(response.reason_phrase, status_code)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaURLTests(TestCase):
+    """Тестирование отдачи медиафайлов."""
+    content = b'0123456789'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.name = default_storage.save(
+            'posts/file.txt', ContentFile(cls.content)
+        )
+        cls.url = settings.MEDIA_URL + cls.name
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_file_is_served_with_immutable_cache(self):
+        """Файл с хешем в имени отдается и кэшируется навсегда."""
+        response = self.client.get(self.url)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        """Запросы Range отдают часть файла."""
+        for header, status, body in (
+            ('bytes=2-4', 206, b'234'),
+            ('bytes=-3', 206, b'789'),
+            ('bytes=7-', 206, b'789'),
+            ('bytes=20-', 416, b''),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, status)
+                content = (
+                    b''.join(response.streaming_content)
+                    if response.streaming else response.content
+                )
+                self.assertEqual(content, body)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_file_is_delegated_to_web_server(self):
+        """Байты файла передает веб-сервер."""
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            settings.MEDIA_SENDFILE_PREFIX + self.name,
+        )
+        self.assertEqual(response.content, b'')
+
+    def test_private_files_are_not_served(self):
+        """Файлы вне публичных каталогов не отдаются."""
+        for path in ('posts/../../manage.py', 'other/file.txt',
+                     'posts/missing.txt', self.name + '.tmp'):
+            with self.subTest(path=path):
+                response = self.client.get(settings.MEDIA_URL + path)
+                self.assertEqual(response.status_code, 404)
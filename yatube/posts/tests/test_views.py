@@ -1,19 +1,43 @@
+import importlib
+import os
 import shutil
+import sys
 import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
 from django import forms
 from django.core.cache import cache
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
-from django.test import Client, TestCase, override_settings
+from django.test import Client, SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
+from django.utils.module_loading import import_string
+from PIL import Image
+from sorl.thumbnail import default
 
-from posts.models import Follow, Comment, Group, Post, User
+from core.checks import check_performance_settings
+from core.metrics import BudgetExceeded, get_totals, reset_totals
+from core.warmup import warm_up
+from posts import benchmark, follow_graph, timeline
+from posts.caching import TAG_TIME_KEY_PREFIX
+from posts.query_plans import check_feed_queries
+from posts.warmup import warm_group_pages
+from posts.models import (
+    Follow, Comment, Group, Post, ThumbnailJob, TimelineEntry, User,
+)
+from posts.thumbnails import (
+    CARD_VARIANTS, CLAIM_TIMEOUT, RESPONSIVE_WIDTHS, claim_jobs, process_jobs,
+    schedule_thumbnails,
+)
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, VIEW_BUDGETS_STRICT=True)
 class PostsPagesTests(TestCase):
     """Тестируем views приложения posts"""
     FIRST_OBJ = 0
@@ -210,6 +234,237 @@ class PostsPagesTests(TestCase):
                     context = response.context['page_obj']
                     self.assertEqual(len(context), post_cnt)
 
+    def test_keyset_paginator_cursors(self):
+        """Проверяем переходы по курсорам keyset-пагинатора."""
+        url = reverse('posts:profile', args=['author'])
+        first_page = self.auth_client.get(url).context['page_obj']
+        self.assertIsNone(first_page.previous_cursor)
+        self.assertEqual(len(first_page), 10)
+
+        second_page = self.auth_client.get(
+            url, {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            list(second_page),
+            list(Post.objects.filter(author=self.user)[10:]),
+        )
+        self.assertIsNone(second_page.next_cursor)
+
+        previous_page = self.auth_client.get(
+            url, {'cursor': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(previous_page), list(first_page))
+        self.assertIsNotNone(previous_page.next_cursor)
+
+    def test_keyset_paginator_invalid_cursor(self):
+        """Битый курсор возвращает первую страницу ленты."""
+        response = self.client.get(
+            reverse('posts:group_posts', kwargs={'slug': 'test-slug'}),
+            {'cursor': 'not-a-cursor'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context['page_obj'][self.FIRST_OBJ], self.post
+        )
+
+    def test_feed_pages_queries_count(self):
+        """Ленты отрисовываются фиксированным числом запросов к БД."""
+        writer = User.objects.create_user(username='writer')
+        Post.objects.bulk_create(Post(
+            author=writer,
+            text=f'Пост без картинки!!![{i}]',
+            group=self.group2,
+        ) for i in range(12))
+        Follow.objects.create(user=self.unfollower, author=writer)
+        feeds_queries = {
+            reverse('posts:index'): (self.client, 1),
+            reverse('posts:group_posts', kwargs={'slug': 'test-slug2'}): (
+                self.client, 2
+            ),
+            reverse('posts:profile', args=['writer']): (self.client, 3),
+            reverse('posts:follow_index'): (self.unfollower_client, 5),
+        }
+        for url, (client, queries) in feeds_queries.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    client.get(url)
+
+    @mock.patch('posts.services.NUM_COMMENTS_PER_PAGE', 3)
+    def test_comments_are_paginated(self):
+        """Комментарии листаются курсором и подгружаются через JSON."""
+        Comment.objects.bulk_create(Comment(
+            post=self.post_to_delete,
+            author=self.follower,
+            text=f'Комментарий [{i}]',
+        ) for i in range(5))
+        response = self.client.get(reverse(
+            'posts:post_detail', args=[self.post_to_delete.pk]
+        ))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 3)
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse(
+                    'posts:post_comments', args=[self.post_to_delete.pk]
+                ),
+                {'cursor': comments.next_cursor},
+            )
+        data = response.json()
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['html'].count('Комментарий ['), 2)
+
+    @override_settings(VIEW_QUERY_BUDGETS={'posts:index': 1})
+    def test_query_budget_and_metrics(self):
+        """Превышение бюджета запросов роняет тест, метрики видны."""
+        reset_totals()
+        with self.assertRaises(BudgetExceeded):
+            self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('"1 hits, 0 misses"', response['Server-Timing'])
+        totals = self.client.get(reverse('metrics')).json()['posts:index']
+        self.assertEqual(totals['requests'], 2)
+        self.assertEqual(totals['over_budget'], 1)
+        with override_settings(EXPOSE_METRICS=False):
+            response = self.client.get(reverse('posts:index'))
+            self.assertNotIn('Server-Timing', response)
+            self.assertEqual(self.client.get(reverse('metrics')).status_code,
+                             403)
+            self.user.is_staff = True
+            self.user.save()
+            self.client.force_login(self.user)
+            self.assertEqual(self.client.get(reverse('metrics')).status_code,
+                             200)
+
+    def test_benchmark_drives_feeds(self):
+        """Нагрузочный прогон наполняет базу и меряет все ленты."""
+        cache.set('working_key', 1)
+        benchmark.seed(users=3, groups=1, posts=5, follows=2, comments=5,
+                       images=1)
+        results = benchmark.run(requests=2, cold=True)
+        self.assertEqual(set(results), {
+            'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+        })
+        for result in results.values():
+            self.assertGreaterEqual(result['p99'], result['p50'])
+            self.assertGreater(result['queries'], 0)
+        # Холодный прогон не очищает рабочий кэш.
+        self.assertEqual(cache.get('working_key'), 1)
+
+    def test_json_api_feeds(self):
+        """JSON-ленты листаются курсором и поддерживают условный GET."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(len(data['results']), 10)
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
+        second = self.client.get(url, {'cursor': data['next_cursor']})
+        self.assertEqual(len(second.json()['results']), 3)
+        not_modified = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        Post.objects.create(author=self.user, text='Свежий пост!')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(
+            self.client.get(reverse('posts:api_follow_index')).status_code,
+            403,
+        )
+        detail = self.follower_client.get(
+            reverse('posts:api_post_detail', args=[self.post.pk])
+        ).json()
+        self.assertEqual(detail['post']['author']['username'], 'author')
+
+    def test_json_api_export_streams_posts(self):
+        """Выгрузка постов идёт потоком NDJSON и доступна персоналу."""
+        url = reverse('posts:api_export_posts')
+        self.assertEqual(self.auth_client.get(url).status_code, 403)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(url)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), Post.objects.count())
+        self.client.logout()
+
+    def test_feed_pages_support_conditional_get(self):
+        """Неизменившаяся страница отдаётся ответом 304 без отрисовки."""
+        # Сессия и пользователь, а для автора или поста — ещё один запрос.
+        urls = {
+            reverse('posts:index'): 2,
+            reverse('posts:group_posts', kwargs={'slug': 'test-slug'}): 2,
+            reverse('posts:profile', args=['author']): 3,
+            reverse('posts:post_detail', args=[self.post.pk]): 3,
+        }
+        for url, queries in urls.items():
+            with self.subTest(url=url):
+                response = self.follower_client.get(url)
+                # Дата не зависит от пользователя: вошедшим только ETag.
+                self.assertNotIn('Last-Modified', response)
+                with self.assertNumQueries(queries):
+                    not_modified = self.follower_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(
+                    self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    ).status_code,
+                    200,
+                )
+        profile_url = reverse('posts:profile', args=['author'])
+        etag = self.unfollower_client.get(profile_url)['ETag']
+        Follow.objects.create(user=self.unfollower, author=self.user)
+        response = self.unfollower_client.get(
+            profile_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_modified_follows_changes(self):
+        """Правка поста сдвигает Last-Modified страницы и ленты API."""
+        for url in (reverse('posts:index'), reverse('posts:api_index')):
+            with self.subTest(url=url):
+                cache.set_many({
+                    f'{TAG_TIME_KEY_PREFIX}{tag}': time.time() - 10
+                    for tag in ('posts', 'groups')
+                })
+                response = self.client.get(url)
+                not_modified = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(not_modified.status_code, 304)
+                self.post.save()
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_group_feed_uses_cached_group_and_index(self):
+        """Группа берётся из кэша, лента группы читается по индексу."""
+        url = reverse('posts:group_posts', kwargs={'slug': 'test-slug'})
+        self.client.get(url)
+        Post.objects.create(
+            author=self.user, text='Новый пост группы!', group=self.group
+        )
+        with self.assertNumQueries(1):
+            self.assertContains(self.client.get(url), 'Новый пост группы!')
+        Group.objects.filter(pk=self.group.pk).update(title='Новое имя')
+        Group.objects.get(pk=self.group.pk).save()
+        self.assertContains(self.client.get(url), 'Новое имя')
+        plan = self.group.posts.order_by('-pub_date', '-id')[:10].explain()
+        self.assertIn('post_group_feed_idx', plan)
+
+    def test_feed_queries_use_indexes(self):
+        """Ленты автора, группы и комментарии читаются по индексам."""
+        results = check_feed_queries()
+        for name in ('index', 'group_posts', 'profile', 'post_comments',
+                     'followers', 'following'):
+            for query in (name, f'{name} (курсор)'):
+                if query in results:
+                    with self.subTest(query=query):
+                        plan, problems = results[query]
+                        self.assertEqual(problems, [], plan)
+
     def test_creating_post(self):
         """Проверяем, что пост отображатся где надо."""
         pages_names_presence_post = {
@@ -228,20 +483,179 @@ class PostsPagesTests(TestCase):
                 self.assertEqual(post in context, presence_post)
 
     def test_save_post_in_cache(self):
-        """Пост сохраняется в кэше и пропадает после отчистки кэша."""
+        """Главная кэшируется и сбрасывается при изменении постов."""
         # Первый запрос для того, что бы кэшировались посты на странице
         self.response()
-        # даляем пост из БД и запрашиваем пост из кэша
-        Post.objects.get(id=self.post_to_delete.id).delete()
+        # Изменение в обход сигналов не сбрасывает кэш
+        Post.objects.filter(id=self.post_to_delete.id).update(text='Новое!')
         self.assertTrue(
             self.post_to_delete.text.encode() in self.response().content
         )
-        # Чистим кэш и снова ищем пост на странице
-        cache.clear()
+        # Удаление поста сразу сбрасывает кэш страницы
+        Post.objects.get(id=self.post_to_delete.id).delete()
         self.assertFalse(
             self.post_to_delete.text.encode() in self.response().content
         )
 
+    def test_cached_pages_follow_related_changes(self):
+        """Кэш страниц сбрасывается при изменении групп и комментариев."""
+        group_url = reverse('posts:group_posts', kwargs={'slug': 'test-slug'})
+        detail_url = reverse('posts:post_detail', args=[self.post.pk])
+        self.client.get(group_url)
+        self.client.get(detail_url)
+        Group.objects.filter(pk=self.group.pk).update(title='Новое имя')
+        Comment.objects.create(
+            post=self.post,
+            author=self.follower,
+            text='Свежий комментарий',
+        )
+        self.assertContains(self.client.get(detail_url), 'Свежий комментарий')
+        self.assertNotContains(self.client.get(group_url), 'Новое имя')
+        Group.objects.get(pk=self.group.pk).save()
+        self.assertContains(self.client.get(group_url), 'Новое имя')
+
+    def test_unknown_params_share_page_cache(self):
+        """Посторонние параметры запроса не заводят новых страниц в кэше."""
+        index_url = reverse('posts:index')
+        self.client.get(index_url, {'page': '1'})
+        reset_totals()
+        for params in ({}, {'utm_source': 'x'}, {'page': '01'},
+                       {'page': 'abc', 'q': 'y'}):
+            with self.subTest(params=params):
+                self.client.get(index_url, params)
+        totals = get_totals()['posts:index']
+        self.assertEqual(totals['cache_misses'], 0)
+        self.assertEqual(totals['cache_hits'], 4)
+
+    def test_group_pages_are_warmed(self):
+        """Первая страница группы попадает в кэш до первого запроса."""
+        self.assertEqual(warm_group_pages(), Group.objects.count())
+        reset_totals()
+        response = self.client.get(
+            reverse('posts:group_posts', kwargs={'slug': 'test-slug'})
+        )
+        self.assertContains(response, self.group.title)
+        totals = get_totals()['posts:group_posts']
+        self.assertEqual(totals['cache_hits'], 1)
+        self.assertEqual(totals['cache_misses'], 0)
+
+    def test_post_cards_are_cached(self):
+        """Карточка поста кэшируется до изменения поста."""
+        group_url = reverse('posts:group_posts', kwargs={'slug': 'test-slug'})
+        self.client.get(group_url)
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка!')
+        # Сбрасываем кэш страницы, но не карточки
+        Group.objects.get(pk=self.group.pk).save()
+        self.assertContains(self.client.get(group_url), self.post.text)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст!'
+        post.save()
+        self.assertContains(self.client.get(group_url), 'Новый текст!')
+
+    def test_thumbnails_are_generated_off_request(self):
+        """Пока миниатюры нет, в карточке заглушка, а не её генерация."""
+        placeholder = settings.THUMBNAIL_DUMMY_SOURCE
+        self.assertContains(self.response(), placeholder)
+        self.assertTrue(
+            ThumbnailJob.objects.filter(image=self.post.image.name).exists()
+        )
+        call_command(
+            'generate_thumbnails', workers=1, stdout=StringIO()
+        )
+        self.assertFalse(ThumbnailJob.objects.exists())
+        response = self.response()
+        self.assertNotContains(response, placeholder)
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+
+    def test_thumbnail_jobs_are_claimed_and_retried(self):
+        """
+        Задачу берёт один обработчик, неудачная остаётся в очереди и
+        берётся снова только через CLAIM_TIMEOUT.
+        """
+        schedule_thumbnails(self.post.image.name)
+        schedule_thumbnails('posts/missing.jpg')
+        with self.assertLogs('sorl.thumbnail', 'ERROR'):
+            self.assertEqual(process_jobs(), 2)
+        job = ThumbnailJob.objects.get()
+        self.assertEqual(job.image, 'posts/missing.jpg')
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(claim_jobs('worker', 10), [])
+        ThumbnailJob.objects.update(
+            claimed_at=job.claimed_at - timedelta(seconds=CLAIM_TIMEOUT + 1)
+        )
+        self.assertEqual(claim_jobs('worker', 10), [job])
+        self.assertEqual(claim_jobs('other', 10), [])
+
+    def test_feed_thumbnails_are_prefetched(self):
+        """Миниатюры ленты достаются одним пакетом, промахи считаются."""
+        reset_totals()
+        self.response()
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        cache.clear()
+        with mock.patch.object(default.kvstore, 'get') as kvstore_get:
+            response = self.response()
+        kvstore_get.assert_not_called()
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+        counters = self.client.get(reverse('metrics')).json()['counters']
+        self.assertEqual(counters['thumbnails.misses'], len(CARD_VARIANTS))
+        self.assertEqual(counters['thumbnails.hits'], len(CARD_VARIANTS))
+
+    def test_post_images_have_width_variants(self):
+        """
+        Картинка поста отдаётся вариантами разной ширины в srcset, но не
+        шире исходника.
+        """
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 600)).save(buffer, 'PNG')
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост с широкой картинкой!',
+            image=SimpleUploadedFile('wide.png', buffer.getvalue()),
+        )
+        detail_url = reverse('posts:post_detail', args=[post.pk])
+        response = self.client.get(detail_url)
+        self.assertNotContains(response, 'srcset=')
+        self.assertContains(response, 'width="960" height="339"')
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        for url in (detail_url, reverse('posts:index')):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                for width in (*RESPONSIVE_WIDTHS[:-1], 1200):
+                    self.assertContains(response, f' {width}w')
+                self.assertNotContains(response, ' 1920w')
+                self.assertContains(response, 'width="960" height="339"')
+                self.assertContains(response, 'loading="lazy"')
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertNotContains(response, 'srcset=')
+        self.assertContains(response, 'width="2" height="1"')
+
+    def test_search_finds_posts_by_prefix(self):
+        """Поиск находит посты по началу слова и листается курсором."""
+        url = reverse('posts:search')
+        page_obj = self.client.get(url, {'q': 'тестов'}).context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        next_page = self.client.get(
+            url, {'q': 'тестов', 'cursor': page_obj.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            set(page_obj) | set(next_page), set(Post.objects.all())
+        )
+        page_obj = self.client.get(url, {'q': 'КЭША'}).context['page_obj']
+        self.assertEqual(list(page_obj), [self.post_to_delete])
+
+    def test_search_index_follows_post_changes(self):
+        """Индекс поиска обновляется при изменении и удалении поста."""
+        url = reverse('posts:search')
+        self.post_to_delete.text = 'Уникальное слово!'
+        self.post_to_delete.save()
+        page_obj = self.client.get(url, {'q': 'уникальн'}).context['page_obj']
+        self.assertEqual(list(page_obj), [self.post_to_delete])
+        self.post_to_delete.delete()
+        page_obj = self.client.get(url, {'q': 'уникальн'}).context['page_obj']
+        self.assertEqual(len(page_obj), 0)
+
     def response(self):
         """Возращает ответ сервера на запрос пользователя страницы index."""
         return self.client.get(reverse('posts:index'))
@@ -280,3 +694,217 @@ class PostsPagesTests(TestCase):
         for result, response in result_and_responses.items():
             context = response.context['page_obj']
             self.assertEqual(self.post in context, result)
+
+    def test_follow_feed_is_materialized(self):
+        """Новый пост раскладывается в ленты подписчиков при публикации."""
+        post = Post.objects.create(author=self.user, text='Новый пост!')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post
+        ).exists())
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.unfollower, post=post
+        ).exists())
+        self.follower_client.get(reverse(
+            'posts:profile_unfollow', args=['author']
+        ))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.follower
+        ).exists())
+
+    def test_follow_graph_is_cached(self):
+        """Подписки читаются из кэша и обновляются при подписке."""
+        follow_graph.get_following(self.unfollower.pk)
+        follow_graph.get_followers_counts([self.user.pk])
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                follow_graph.is_following(self.unfollower, self.user.pk)
+            )
+        self.unfollower_client.get(reverse(
+            'posts:profile_follow', args=['author']
+        ))
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.is_following(self.unfollower, self.user.pk)
+            )
+            self.assertEqual(
+                follow_graph.get_followers_counts([self.user.pk]),
+                {self.user.pk: 2},
+            )
+        response = self.unfollower_client.get(reverse(
+            'posts:profile', args=['author']
+        ))
+        self.assertTrue(response.context['following'])
+
+    @mock.patch('posts.timeline.FANOUT_FOLLOWERS_LIMIT', 1)
+    def test_follow_feed_reads_popular_authors(self):
+        """Посты популярных авторов подмешиваются в ленту при чтении."""
+        timeline.promote_pull_authors([self.user.pk])
+        post = Post.objects.create(author=self.user, text='Новый пост!')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        url = reverse('posts:follow_index')
+        page_obj = self.follower_client.get(url).context['page_obj']
+        self.assertEqual(page_obj[0], post)
+        # Посты из записей ленты и прочитанные при запросе сливаются
+        # без повторов и пропусков при листании курсором.
+        posts = list(page_obj)
+        while page_obj.next_cursor:
+            page_obj = self.follower_client.get(
+                url, {'cursor': page_obj.next_cursor}
+            ).context['page_obj']
+            posts.extend(page_obj)
+        self.assertEqual(
+            posts, list(Post.objects.filter(author=self.user))
+        )
+
+    @mock.patch('posts.timeline.FANOUT_RETURN_LIMIT', 1)
+    @mock.patch('posts.timeline.FANOUT_FOLLOWERS_LIMIT', 2)
+    def test_unfollow_does_not_refan_popular_authors(self):
+        """
+        Отписка не раскладывает посты автора в запросе: режим меняет
+        команда, когда подписчиков заметно меньше порога.
+        """
+        follow_url = reverse('posts:profile_follow', args=['author'])
+        unfollow_url = reverse('posts:profile_unfollow', args=['author'])
+        self.unfollower_client.get(follow_url)
+        self.assertTrue(timeline.is_pull_author(self.user.pk))
+        post = Post.objects.create(author=self.user, text='Новый пост!')
+        self.unfollower_client.get(unfollow_url)
+        self.assertTrue(timeline.is_pull_author(self.user.pk))
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(
+            self.follower_client.get(
+                reverse('posts:follow_index')
+            ).context['page_obj'][0],
+            post,
+        )
+        with mock.patch('posts.timeline.FANOUT_RETURN_LIMIT', 2):
+            call_command('refresh_pull_authors', stdout=StringIO())
+        self.assertFalse(timeline.is_pull_author(self.user.pk))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post
+        ).exists())
+
+    def test_bulk_follow_and_unfollow(self):
+        """Подписка и отписка на нескольких авторов одним запросом."""
+        User.objects.create_user(username='second')
+        response = self.unfollower_client.post(
+            reverse('posts:follow_bulk'),
+            {'usernames': ['author,second', 'unfollower', 'nobody']},
+        )
+        self.assertEqual(response.json(), {'followed': ['author', 'second']})
+        self.assertEqual(Follow.objects.filter(
+            user=self.unfollower
+        ).count(), 2)
+        self.user.stats.refresh_from_db()
+        self.unfollower.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.followers_count, 2)
+        self.assertEqual(self.unfollower.stats.following_count, 2)
+        self.assertTrue(
+            follow_graph.is_following(self.unfollower, self.user.pk)
+        )
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.unfollower, post=self.post
+        ).exists())
+        response = self.unfollower_client.post(
+            reverse('posts:unfollow_bulk'), {'usernames': 'author,second'}
+        )
+        self.assertEqual(
+            response.json(), {'unfollowed': ['author', 'second']}
+        )
+        self.assertFalse(Follow.objects.filter(
+            user=self.unfollower
+        ).exists())
+        self.user.stats.refresh_from_db()
+        self.unfollower.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.followers_count, 1)
+        self.assertEqual(self.unfollower.stats.following_count, 0)
+        self.assertFalse(
+            follow_graph.is_following(self.unfollower, self.user.pk)
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.unfollower).exists()
+        )
+        response = self.unfollower_client.get(reverse('posts:follow_bulk'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_unfollow_without_follow(self):
+        """Отписка от автора без подписки не приводит к ошибке."""
+        response = self.unfollower_client.get(reverse(
+            'posts:profile_unfollow', args=['author']
+        ))
+        self.assertRedirects(
+            response, reverse('posts:profile', args=['author'])
+        )
+
+    def test_follow_suggestions(self):
+        """Рекомендации строятся по подпискам похожих пользователей."""
+        suggested = User.objects.create_user(username='suggested')
+        Follow.objects.create(user=self.follower, author=suggested)
+        Follow.objects.create(user=self.unfollower, author=self.user)
+        call_command('refresh_follow_suggestions', stdout=StringIO())
+        response = self.unfollower_client.get(
+            reverse('posts:follow_suggestions')
+        )
+        self.assertEqual(
+            [item['username'] for item in response.json()['suggestions']],
+            ['suggested'],
+        )
+        Follow.objects.create(user=self.unfollower, author=suggested)
+        response = self.unfollower_client.get(
+            reverse('posts:follow_suggestions')
+        )
+        self.assertEqual(response.json()['suggestions'], [])
+
+
+class PerformanceSettingsTests(SimpleTestCase):
+    """Тестируем проверку медленных настроек и прогрев процесса"""
+
+    def test_warm_up_compiles_templates(self):
+        """Прогрев компилирует шаблоны проекта и разбирает URL."""
+        result = warm_up()
+        self.assertGreaterEqual(result['templates'], 28)
+        self.assertGreater(result['urls'], 0)
+
+    @override_settings(DEBUG=True)
+    def test_development_settings_are_reported(self):
+        """Настройки разработки отмечены как медленные."""
+        self.assertEqual(
+            [warning.id for warning in check_performance_settings()],
+            ['core.W001', 'core.W002', 'core.W003', 'core.W004',
+             'core.W005'],
+        )
+
+    @staticmethod
+    def production_settings(**environ):
+        """Модуль yatube.settings_production, загруженный заново."""
+        environ.setdefault('DJANGO_SECRET_KEY', 'secret')
+        with mock.patch.dict(os.environ, environ):
+            sys.modules.pop('yatube.settings_production', None)
+            return importlib.import_module('yatube.settings_production')
+
+    def check_production_settings(self, production):
+        config = production.CACHES['default']
+        # Клиент кэш-сервера установлен: бэкенд создаётся без ошибок.
+        import_string(config['BACKEND'])(config['LOCATION'], config)
+        with override_settings(
+            DEBUG=production.DEBUG,
+            CACHES=production.CACHES,
+            TEMPLATES=production.TEMPLATES,
+            SQLITE_PRAGMAS=production.SQLITE_PRAGMAS,
+        ), mock.patch.dict(
+            settings.DATABASES['default'],
+            CONN_MAX_AGE=production.DATABASES['default']['CONN_MAX_AGE'],
+        ):
+            return [warning.id for warning in check_performance_settings()]
+
+    def test_production_settings_pass(self):
+        """С настройками боевого окружения предупреждений нет."""
+        self.assertEqual(
+            self.check_production_settings(self.production_settings()), []
+        )
+        production = self.production_settings(
+            DJANGO_CACHE_URL='file://' + TEMP_MEDIA_ROOT
+        )
+        self.assertEqual(
+            self.check_production_settings(production), ['core.W006']
+        )
@@ -0,0 +1,290 @@
+"""
+Фоновая генерация миниатюр картинок постов.
+
+Новая картинка попадает в очередь ThumbnailJob, которую разбирает
+пул потоков команды `generate_thumbnails --watch`: загруженная картинка
+сначала пережимается (posts.images), потом из неё режутся миниатюры.
+Тег {% thumbnail %} в шаблонах больше не декодирует картинку в запросе:
+если миниатюры ещё нет, он ставит картинку в очередь и отдаёт заглушку.
+Для карточек картинка режется сразу в нескольких ширинах
+(RESPONSIVE_WIDTHS), из которых тег responsive_image собирает srcset.
+
+Задачи пачки обработчик забирает себе одним UPDATE (claimed_by,
+claimed_at), поэтому несколько процессов не режут одну картинку
+дважды. Из очереди удаляются только успешные задачи; неудачная
+остаётся с увеличенным attempts и берётся снова через CLAIM_TIMEOUT,
+пока попыток меньше MAX_ATTEMPTS.
+
+Сведения о готовых миниатюрах ленты prefetch_thumbnails() достаёт
+из KV-хранилища (posts.kvstore) одним пакетом на страницу, а не
+запросом на каждую карточку. Попадания и промахи считаются в
+счётчиках thumbnails.hits и thumbnails.misses (см. view metrics).
+"""
+import logging
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+from core.metrics import count, record_cache
+from posts.caching import bump_tags
+from posts.images import normalize_image
+from posts.models import Post, ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WORKERS = 2
+# Пока ключ жив, промах в шаблоне не пишет в очередь на каждом
+# просмотре страницы; после обработки задачи ключ удаляется.
+RETRY_TIMEOUT = 60
+# Через сколько секунд задачу упавшего или неудачливого обработчика
+# можно взять снова.
+CLAIM_TIMEOUT = 10 * 60
+MAX_ATTEMPTS = 5
+# Ширины вариантов картинки поста для srcset: телефону хватает 320–640
+# пикселей, 1920 нужны широким экранам с высокой плотностью пикселей.
+RESPONSIVE_WIDTHS = (320, 640, 960, 1920)
+# Ширина варианта для src, если браузер не понимает srcset.
+DEFAULT_WIDTH = 960
+CARD_RATIO = 339 / 960
+# Без upscale: вариант шире исходника не больше самого исходника.
+CARD_OPTIONS = {'crop': 'center', 'upscale': False}
+# Миниатюры, которые показывает сайт: (геометрия, опции тега thumbnail).
+THUMBNAIL_GEOMETRIES = {
+    **{
+        f'card_{width}': (
+            f'{width}x{round(width * CARD_RATIO)}', CARD_OPTIONS
+        )
+        for width in RESPONSIVE_WIDTHS
+    },
+    'admin': ('100x100', {'crop': 'center'}),
+}
+CARD_VARIANTS = tuple(f'card_{width}' for width in RESPONSIVE_WIDTHS)
+
+
+def _geometries():
+    return set(
+        (geometry, tuple(sorted(options.items())))
+        for geometry, options in THUMBNAIL_GEOMETRIES.values()
+    )
+
+
+def _record_lookups(hits=0, misses=0):
+    count('thumbnails.hits', hits)
+    count('thumbnails.misses', misses)
+    record_cache(hits=hits, misses=misses)
+
+
+def _get_many(thumbnails):
+    kvstore = default.kvstore
+    if hasattr(kvstore, 'get_many'):
+        return kvstore.get_many(thumbnails)
+    return {thumbnail.key: kvstore.get(thumbnail) for thumbnail in thumbnails}
+
+
+def prefetch_thumbnails(posts, *geometry_names):
+    """
+    Достаёт из KV-хранилища миниатюры geometry_names (ключи
+    THUMBNAIL_GEOMETRIES) для картинок всех posts одним пакетом и
+    запоминает их у post.image: тег {% thumbnail %} этих постов больше
+    не обращается к хранилищу. Недостающие миниатюры тег, как обычно,
+    поставит в очередь.
+    """
+    backend = default.backend
+    geometries = [THUMBNAIL_GEOMETRIES[name] for name in geometry_names]
+    wanted = []
+    for post in posts:
+        if not post.image:
+            continue
+        source = ImageFile(post.image)
+        wanted.append((post.image, [
+            backend._thumbnail_file(source, geometry, dict(options))
+            for geometry, options in geometries
+        ]))
+    if not wanted:
+        return
+    found = _get_many(
+        [thumbnail for _, thumbnails in wanted for thumbnail in thumbnails]
+    )
+    for file_, thumbnails in wanted:
+        file_.prefetched_thumbnails = {
+            thumbnail.key: found[thumbnail.key] for thumbnail in thumbnails
+        }
+    hits = sum(1 for thumbnail in found.values() if thumbnail)
+    _record_lookups(hits=hits, misses=len(found) - hits)
+
+
+def responsive_thumbnails(image):
+    """
+    Готовые варианты картинки image для srcset, от узкого к широкому.
+    Варианты шире исходника не увеличиваются, а совпадают с ним по
+    ширине; в srcset из них остаётся один. Пока вариантов нет,
+    возвращает одну заглушку (картинка уже в очереди).
+    """
+    backend = default.backend
+    variants = []
+    for name in CARD_VARIANTS:
+        geometry, options = THUMBNAIL_GEOMETRIES[name]
+        variants.append(backend.get_thumbnail(image, geometry, **options))
+    ready = []
+    for variant in variants:
+        if isinstance(variant, DummyImageFile):
+            continue
+        if ready and variant.width <= ready[-1].width:
+            continue
+        ready.append(variant)
+    if ready:
+        return ready
+    return [variants[RESPONSIVE_WIDTHS.index(DEFAULT_WIDTH)]]
+
+
+def _retry_key(name):
+    return f'thumbnail_retry:{name}'
+
+
+def schedule_thumbnails(name):
+    """Ставит картинку в очередь на создание миниатюр."""
+    # INSERT OR IGNORE: одна команда без чтения и точек сохранения.
+    ThumbnailJob.objects.bulk_create(
+        [ThumbnailJob(image=name)], ignore_conflicts=True
+    )
+
+
+def _thumbnails_ready(name):
+    """Сбрасывает кэш карточек и страниц, где вместо картинки заглушка."""
+    posts = Post.objects.filter(image=name)
+    tags = {'posts'}
+    for pk, author_id, group_id in posts.values_list(
+        'pk', 'author_id', 'group_id'
+    ):
+        tags.update((f'post:{pk}', f'author:{author_id}'))
+        if group_id:
+            tags.add(f'group:{group_id}')
+    posts.update(updated=timezone.now())
+    bump_tags(*tags)
+
+
+def generate_thumbnails(name):
+    """
+    Создаёт все миниатюры картинки name синхронно. Возвращает True,
+    если все они готовы.
+    """
+    backend = ThumbnailBackend()
+    try:
+        # Миниатюры режутся из уже уменьшенной картинки.
+        name = normalize_image(name)
+        # Источник в том же хранилище, что и у поля модели: от него
+        # зависят ключи sorl и имена миниатюр.
+        source = ImageFile(name, default_storage)
+        thumbnails = [
+            backend.get_thumbnail(source, geometry, **dict(options))
+            for geometry, options in _geometries()
+        ]
+        # Если исходник не читается, sorl не сохраняет миниатюру в
+        # KV-хранилище: кэш страниц тогда сбрасывать незачем.
+        if not all(default.kvstore.get(thumbnail) for thumbnail in thumbnails):
+            return False
+        _thumbnails_ready(name)
+        return True
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', name)
+        return False
+    finally:
+        close_old_connections()
+
+
+def _claimable(now):
+    return ThumbnailJob.objects.filter(
+        Q(claimed_at__isnull=True)
+        | Q(claimed_at__lt=now - timedelta(seconds=CLAIM_TIMEOUT)),
+        attempts__lt=MAX_ATTEMPTS,
+    )
+
+
+def claim_jobs(worker, batch_size):
+    """
+    Забирает обработчику worker до batch_size свободных задач и
+    возвращает их. UPDATE повторяет условие выборки, поэтому задачу,
+    которую успел забрать другой обработчик, он не перезапишет.
+    """
+    now = timezone.now()
+    pks = list(_claimable(now).values_list('pk', flat=True)[:batch_size])
+    if not pks:
+        return []
+    _claimable(now).filter(pk__in=pks).update(
+        claimed_by=worker, claimed_at=now
+    )
+    return list(ThumbnailJob.objects.filter(pk__in=pks, claimed_by=worker))
+
+
+def process_jobs(map_func=map, batch_size=100):
+    """
+    Разбирает одну пачку очереди, вызывая generate_thumbnails через
+    map_func (например, executor.map пула потоков).
+    Возвращает число обработанных картинок.
+    """
+    worker = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    jobs = claim_jobs(worker, batch_size)
+    if not jobs:
+        return 0
+    results = list(map_func(generate_thumbnails, [job.image for job in jobs]))
+    done = [job.pk for job, ok in zip(jobs, results) if ok]
+    failed = [job.pk for job, ok in zip(jobs, results) if not ok]
+    ThumbnailJob.objects.filter(pk__in=done, claimed_by=worker).delete()
+    # claimed_at остаётся: задачу возьмут снова через CLAIM_TIMEOUT.
+    ThumbnailJob.objects.filter(pk__in=failed, claimed_by=worker).update(
+        claimed_by='', attempts=F('attempts') + 1
+    )
+    cache.delete_many([_retry_key(job.image) for job in jobs])
+    return len(jobs)
+
+
+class BackgroundThumbnailBackend(ThumbnailBackend):
+    """
+    Бэкенд sorl-thumbnail, который не создаёт миниатюры на пути запроса.
+    Готовая миниатюра берётся из сведений prefetch_thumbnails() или из
+    KV-хранилища, недостающая ставится в очередь, а вместо неё
+    отдаётся заглушка.
+    """
+
+    def _thumbnail_file(self, source, geometry_string, options):
+        # Те же опции, что и в ThumbnailBackend.get_thumbnail, чтобы
+        # имя миниатюры совпадало с созданной в фоне.
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        thumbnail = self._thumbnail_file(source, geometry_string, options)
+        prefetched = getattr(file_, 'prefetched_thumbnails', {})
+        if thumbnail.key in prefetched:
+            cached = prefetched[thumbnail.key]
+        else:
+            cached = default.kvstore.get(thumbnail)
+            _record_lookups(hits=int(bool(cached)), misses=int(not cached))
+        if cached:
+            return cached
+        if cache.add(_retry_key(source.name), 1, RETRY_TIMEOUT):
+            schedule_thumbnails(source.name)
+        return DummyImageFile(geometry_string)
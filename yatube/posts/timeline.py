@@ -0,0 +1,238 @@
+"""
+Материализованная лента подписок (fan-out on write).
+
+При публикации поста он раскладывается в ленты всех подписчиков автора,
+при подписке в ленту добавляются посты автора, при отписке — удаляются.
+Посты авторов с огромным числом подписчиков не раскладываются, а
+подмешиваются в ленту при чтении (fan-out on read). Такой автор
+отмечен в ProfileStats.pull_feed; обратно в раскладку его переводит
+команда `refresh_pull_authors`, а не запрос отписки.
+
+Страницы ленты листает TimelinePaginator: он читает записи ленты
+диапазоном индекса и только потом загружает посты страницы.
+"""
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from posts import follow_graph
+from posts.models import Follow, Post, ProfileStats, TimelineEntry
+from posts.paginators import CURSOR_NEXT, KeysetPaginator
+from posts.services import get_feed_queryset
+
+# Автор с таким числом подписчиков становится «pull»-автором: его посты
+# не раскладываются, а читаются при запросе ленты.
+FANOUT_FOLLOWERS_LIMIT = 10000
+# Обратно автор раскладывается по лентам, только когда подписчиков
+# стало меньше этого: иначе подписка и отписка на границе каждый раз
+# переключали бы режим.
+FANOUT_RETURN_LIMIT = 9000
+FANOUT_BATCH_SIZE = 1000
+PULL_AUTHORS_KEY = 'timeline:pull_authors'
+PULL_AUTHORS_TIMEOUT = 60 * 60 * 24
+
+
+def get_pull_authors_set():
+    """Множество id всех «pull»-авторов (их немного), из кэша."""
+    pull_authors = cache.get(PULL_AUTHORS_KEY)
+    if pull_authors is None:
+        pull_authors = frozenset(ProfileStats.objects.filter(
+            pull_feed=True
+        ).values_list('user_id', flat=True))
+        cache.set(PULL_AUTHORS_KEY, pull_authors, PULL_AUTHORS_TIMEOUT)
+    return pull_authors
+
+
+def is_pull_author(author_id):
+    """Посты автора читаются при запросе ленты, а не раскладываются."""
+    return author_id in get_pull_authors_set()
+
+
+def promote_pull_authors(author_ids):
+    """
+    Делает «pull»-авторами тех из author_ids, у кого подписчиков стало
+    не меньше FANOUT_FOLLOWERS_LIMIT. Это один UPDATE: посты таких
+    авторов уже лежат в лентах и просто перестают туда добавляться.
+    """
+    promoted = ProfileStats.objects.filter(
+        user_id__in=author_ids,
+        pull_feed=False,
+        followers_count__gte=FANOUT_FOLLOWERS_LIMIT,
+    ).update(pull_feed=True)
+    if promoted:
+        cache.delete(PULL_AUTHORS_KEY)
+    return promoted
+
+
+def refresh_pull_authors():
+    """
+    Переключает режим авторов по числу подписчиков; вызывается командой
+    `refresh_pull_authors`, а не из запроса. Автор, у которого
+    подписчиков стало меньше FANOUT_RETURN_LIMIT, снова раскладывается:
+    его посты добавляются в ленты всех подписчиков. Возвращает число
+    переключённых в обе стороны авторов.
+    """
+    promoted = ProfileStats.objects.filter(
+        pull_feed=False,
+        followers_count__gte=FANOUT_FOLLOWERS_LIMIT,
+    ).update(pull_feed=True)
+    demoted = list(ProfileStats.objects.filter(
+        pull_feed=True,
+        followers_count__lt=FANOUT_RETURN_LIMIT,
+    ).values_list('user_id', flat=True))
+    # Режим меняется до раскладки: новые посты уже попадут в ленты сами.
+    ProfileStats.objects.filter(user_id__in=demoted).update(pull_feed=False)
+    cache.delete(PULL_AUTHORS_KEY)
+    for author_id in demoted:
+        for follower_id in Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True).iterator():
+            backfill_author(follower_id, author_id)
+    return promoted, len(demoted)
+
+
+def _push(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if is_pull_author(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id)
+    _push(
+        TimelineEntry(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in followers.values_list('user_id', flat=True).iterator()
+    )
+
+
+def fan_out_posts(posts):
+    """
+    Раскладывает пачку постов по лентам подписчиков их авторов за два
+    запроса к БД, а не по два на каждый пост (например, после импорта).
+    """
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    followers = Follow.objects.filter(
+        author_id__in=set(by_author) - get_pull_authors_set()
+    ).values_list('author_id', 'user_id')
+    _push(
+        TimelineEntry(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for author_id, user_id in followers.iterator()
+        for post in by_author[author_id]
+    )
+
+
+def backfill_author(user_id, author_id):
+    """Добавляет в ленту пользователя все посты автора."""
+    if is_pull_author(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    _push(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def drop_authors(user_id, author_ids):
+    """Убирает посты авторов author_ids из ленты пользователя."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id__in=author_ids,
+    ).delete()
+
+
+def drop_author(user_id, author_id):
+    """Убирает посты автора из ленты пользователя."""
+    drop_authors(user_id, [author_id])
+
+
+def get_pull_authors(user):
+    """Возвращает id авторов из подписок, чьи посты читаются при запросе."""
+    return sorted(
+        follow_graph.get_following(user.pk) & get_pull_authors_set()
+    )
+
+
+def get_timeline(user):
+    """
+    Возвращает queryset постов ленты подписок пользователя. Он нужен
+    для старых ссылок `?page=N`; страницы по курсору читает
+    TimelinePaginator.
+    """
+    condition = Q(pk__in=TimelineEntry.objects.filter(
+        user=user
+    ).values('post_id'))
+    pull_authors = get_pull_authors(user)
+    if pull_authors:
+        condition |= Q(author_id__in=pull_authors)
+    return Post.objects.filter(condition)
+
+
+class TimelinePaginator(KeysetPaginator):
+    """
+    Keyset-пагинатор ленты подписок по ключу (pub_date, post_id).
+
+    Записи страницы читаются из TimelineEntry пользователя одним
+    диапазоном индекса (user, -pub_date, -post) без сортировки. Посты
+    pull-авторов добираются отдельными запросами с тем же курсором и тем
+    же пределом и сливаются с записями. Сами посты страницы загружаются
+    одним запросом по первичному ключу.
+    """
+
+    def __init__(self, user, per_page):
+        self.user = user
+        super().__init__(
+            TimelineEntry.objects.filter(user=user).only('pub_date', 'post'),
+            per_page,
+        )
+
+    def _get_ordering(self, ordering):
+        # Пара (пользователь, пост) уникальна, id записи не нужен.
+        return [('pub_date', True), ('post_id', True)]
+
+    @cached_property
+    def pull_paginators(self):
+        # По запросу на pull-автора: каждый читает диапазон индекса
+        # (author, -pub_date) с пределом, общий IN сортировал бы все
+        # посты этих авторов во временном B-дереве.
+        return [
+            KeysetPaginator(
+                Post.objects.filter(author_id=author_id).only('pub_date'),
+                self.per_page,
+                ordering=('-pub_date', '-id'),
+            )
+            for author_id in get_pull_authors(self.user)
+        ]
+
+    def _fetch(self, values, direction, limit):
+        rows = super()._fetch(values, direction, limit)
+        if not self.pull_paginators:
+            return rows
+        # Пост автора, ставшего pull-автором, может лежать и в записях.
+        seen = {row.post_id for row in rows}
+        for paginator in self.pull_paginators:
+            rows.extend(
+                TimelineEntry(post_id=post.pk, pub_date=post.pub_date)
+                for post in paginator._fetch(values, direction, limit)
+                if post.pk not in seen
+            )
+        rows.sort(
+            key=lambda row: (row.pub_date, row.post_id),
+            reverse=direction == CURSOR_NEXT,
+        )
+        return rows[:limit]
+
+    def _page_objects(self, rows):
+        ids = [row.post_id for row in rows]
+        posts = get_feed_queryset(Post.objects.all()).in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
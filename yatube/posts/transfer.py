@@ -0,0 +1,459 @@
+"""
+Потоковый импорт и экспорт групп, постов, комментариев и подписок.
+
+Записи читаются и пишутся по одной (NDJSON или CSV), в БД уходят
+пачками bulk_create, каждая пачка — в своей транзакции. После каждой
+пачки смещение в байтах после последней записи сохраняется в
+файл-контрольную точку, и прерванный импорт продолжается с этого места
+без повторного чтения файла. Память не зависит от размера файла.
+
+Пользователи сопоставляются по username (недостающие создаются без
+пароля), группы — по slug. Посты и комментарии получают новые id, а
+соответствие id из файла и id в базе запоминается в ImportedObject:
+по нему комментарии находят свои посты, а повторный импорт тех же
+записей их не дублирует. Файлы разных сайтов различаются источником.
+"""
+import csv
+import datetime
+import json
+import os
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import follow_graph, media, timeline
+from posts.caching import bump_tags
+from posts.models import (
+    Comment, Follow, Group, ImportedObject, Post, User,
+)
+from posts.stats import rebuild_stats
+
+TRANSFER_BATCH_SIZE = 1000
+FORMATS = ('ndjson', 'csv')
+# Поля выгрузки: имя в файле -> путь в values().
+EXPORT_FIELDS = {
+    'groups': {
+        'id': 'pk',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+    },
+    'posts': {
+        'id': 'pk',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    },
+    'comments': {
+        'id': 'pk',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    },
+    'follows': {
+        'user': 'user__username',
+        'author': 'author__username',
+    },
+}
+MODELS = {
+    'groups': Group,
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+KINDS = tuple(EXPORT_FIELDS)
+
+
+class TransferError(Exception):
+    """Запись файла не удалось импортировать."""
+
+
+def guess_format(path):
+    return 'csv' if path.endswith('.csv') else 'ndjson'
+
+
+class _Lines:
+    """
+    Строки двоичного файла в UTF-8 и смещение сразу после последней
+    прочитанной строки.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.offset = file.tell()
+
+    def seek(self, offset):
+        self.file.seek(offset)
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.file.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode('utf-8')
+
+
+def read_records(file, fmt, offset=0):
+    """
+    Читает записи из файла, открытого в двоичном режиме, начиная со
+    смещения offset. Выдаёт пары (запись, смещение сразу после неё).
+    """
+    lines = _Lines(file)
+    if fmt == 'csv':
+        # csv.reader не читает строки впрок: после каждой записи
+        # смещение указывает ровно на начало следующей.
+        header = next(csv.reader(lines), None)
+        if header is None:
+            return
+        lines.seek(max(offset, lines.offset))
+        for row in csv.reader(lines):
+            if row:
+                yield dict(zip(header, row)), lines.offset
+        return
+    lines.seek(offset)
+    for line in lines:
+        if line.strip():
+            yield json.loads(line), lines.offset
+
+
+def _isoformat(value):
+    # В отличие от DjangoJSONEncoder, сохраняет микросекунды.
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f'{value!r} не сериализуется в JSON')
+
+
+def ndjson_line(record):
+    return json.dumps(record, default=_isoformat, ensure_ascii=False) + '\n'
+
+
+def write_records(file, fmt, fields, records):
+    """Пишет записи в файл по одной и возвращает их число."""
+    written = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(record):
+            file.write(ndjson_line(record))
+    for record in records:
+        write(record)
+        written += 1
+    return written
+
+
+def export_records(kind, batch_size=TRANSFER_BATCH_SIZE):
+    """
+    Выдаёт записи модели пачками по первичному ключу: каждый запрос
+    читает batch_size строк, сколько бы их ни было в таблице.
+    """
+    fields = EXPORT_FIELDS[kind]
+    rows = MODELS[kind].objects.order_by('pk').values(
+        'pk', *fields.values()
+    )
+    last_pk = 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        for row in batch:
+            yield {name: row[path] for name, path in fields.items()}
+        last_pk = batch[-1]['pk']
+
+
+def _required(record, name):
+    value = record.get(name)
+    if value in (None, ''):
+        raise TransferError(f'В записи {record} нет поля {name}')
+    return value
+
+
+def _date(record, name):
+    value = record.get(name)
+    if not value:
+        return timezone.now()
+    try:
+        date = parse_datetime(value)
+    except ValueError:
+        date = None
+    if date is None:
+        raise TransferError(f'В записи {record} поле {name} не дата')
+    return date
+
+
+def _user_ids(usernames):
+    """id пользователей по username; недостающие создаются."""
+    usernames = set(usernames)
+    found = dict(User.objects.filter(username__in=usernames).values_list(
+        'username', 'pk'
+    ))
+    missing = []
+    for username in usernames - set(found):
+        user = User(username=username)
+        user.set_unusable_password()
+        missing.append(user)
+    if missing:
+        User.objects.bulk_create(missing, ignore_conflicts=True)
+        found.update(User.objects.filter(
+            username__in=[user.username for user in missing]
+        ).values_list('username', 'pk'))
+    return found
+
+
+@contextmanager
+def _keep_dates(model):
+    """
+    Отключает auto_now/auto_now_add, чтобы bulk_create сохранил даты из
+    файла. Поля общие для процесса, поэтому только для команд.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _source_id(record, name='id'):
+    try:
+        return int(_required(record, name))
+    except ValueError:
+        raise TransferError(f'В записи {record} поле {name} не число')
+
+
+def _imported_ids(kind, source, source_ids):
+    """id в базе для уже импортированных id из файла."""
+    return dict(ImportedObject.objects.filter(
+        kind=kind, source=source, source_id__in=source_ids,
+    ).values_list('source_id', 'object_id'))
+
+
+def _new_records(kind, source, records):
+    """Записи пачки, которые ещё не импортировались: {id в файле: запись}."""
+    imported = _imported_ids(
+        kind, source, {_source_id(record) for record in records}
+    )
+    fresh = {}
+    for record in records:
+        source_id = _source_id(record)
+        if source_id not in imported:
+            fresh.setdefault(source_id, record)
+    return fresh
+
+
+def _insert(model, objects):
+    """
+    Вставляет объекты и проставляет им id. PostgreSQL возвращает id из
+    bulk_create сам. В SQLite id растут (AUTOINCREMENT), а транзакция
+    пачки держит блокировку записи с первой вставки, поэтому новые
+    строки — последние len(objects) по id.
+    """
+    model.objects.bulk_create(objects, batch_size=TRANSFER_BATCH_SIZE)
+    if objects and objects[0].pk is None:
+        ids = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[:len(objects)]
+        for obj, pk in zip(objects, reversed(list(ids))):
+            obj.pk = pk
+
+
+def _remember(kind, source, source_ids, objects):
+    ImportedObject.objects.bulk_create([
+        ImportedObject(
+            kind=kind, source=source, source_id=source_id, object_id=obj.pk
+        ) for source_id, obj in zip(source_ids, objects)
+    ])
+
+
+def _import_groups(records, source):
+    # id групп из файла не сохраняются: группа узнаётся по slug.
+    Group.objects.bulk_create([
+        Group(
+            title=_required(record, 'title'),
+            slug=_required(record, 'slug'),
+            description=record.get('description') or '',
+        ) for record in records
+    ], ignore_conflicts=True)
+    return set()
+
+
+def _import_posts(records, source):
+    fresh = _new_records('posts', source, records)
+    records = list(fresh.values())
+    authors = _user_ids(_required(record, 'author') for record in records)
+    slugs = {record['group'] for record in records if record.get('group')}
+    groups = dict(Group.objects.filter(slug__in=slugs).values_list(
+        'slug', 'pk'
+    ))
+    posts = []
+    for record in records:
+        pub_date = _date(record, 'pub_date')
+        posts.append(Post(
+            author_id=authors[record['author']],
+            group_id=groups.get(record.get('group')),
+            text=record.get('text') or '',
+            image=record.get('image') or '',
+            pub_date=pub_date,
+            updated=pub_date,
+        ))
+    with _keep_dates(Post):
+        _insert(Post, posts)
+    _remember('posts', source, fresh, posts)
+    timeline.fan_out_posts(posts)
+    # Ссылки на картинки ведут сигналы, а импорт идёт в обход них.
+    images = Counter(post.image.name for post in posts if post.image)
+    for name, count in images.items():
+        media.change_refs(name, count)
+    return set(authors.values())
+
+
+def _import_comments(records, source):
+    fresh = _new_records('comments', source, records)
+    records = list(fresh.values())
+    post_ids = {_source_id(record, 'post') for record in records}
+    posts = _imported_ids('posts', source, post_ids)
+    missing = post_ids - set(posts)
+    if missing:
+        raise TransferError(
+            f'Посты {sorted(missing)} из файла ещё не импортированы'
+        )
+    authors = _user_ids(_required(record, 'author') for record in records)
+    comments = [
+        Comment(
+            post_id=posts[_source_id(record, 'post')],
+            author_id=authors[record['author']],
+            text=record.get('text') or '',
+            created=_date(record, 'created'),
+        ) for record in records
+    ]
+    with _keep_dates(Comment):
+        _insert(Comment, comments)
+    _remember('comments', source, fresh, comments)
+    bump_tags(*{f'post:{comment.post_id}' for comment in comments})
+    return set(authors.values())
+
+
+def _import_follows(records, source):
+    users = _user_ids(
+        _required(record, name)
+        for record in records
+        for name in ('user', 'author')
+    )
+    pairs = {
+        (users[record['user']], users[record['author']])
+        for record in records
+        if record['user'] != record['author']
+    }
+    Follow.objects.bulk_create([
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in pairs
+    ], ignore_conflicts=True)
+    follow_graph.forget(user_ids={user_id for user_id, _ in pairs})
+    # Счётчики подписчиков нужны лентам, чтобы отличить pull-авторов:
+    # автора, которого импорт вывел за предел, не раскладываем.
+    rebuild_stats(User.objects.filter(pk__in=users.values()))
+    timeline.promote_pull_authors({author_id for _, author_id in pairs})
+    for user_id, author_id in pairs:
+        timeline.backfill_author(user_id, author_id)
+    return set()
+
+
+IMPORTERS = {
+    'groups': _import_groups,
+    'posts': _import_posts,
+    'comments': _import_comments,
+    'follows': _import_follows,
+}
+
+
+def checkpoint_path(path):
+    return path + '.checkpoint'
+
+
+def read_checkpoint(path, kind):
+    """
+    Контрольная точка импорта: (смещение в байтах, сколько записей уже
+    импортировано).
+    """
+    try:
+        with open(checkpoint_path(path)) as file:
+            checkpoint = json.load(file)
+    except FileNotFoundError:
+        return 0, 0
+    if checkpoint['kind'] != kind:
+        raise TransferError(
+            f'Контрольная точка {checkpoint_path(path)} записана для '
+            f'{checkpoint["kind"]}, а не для {kind}'
+        )
+    if 'offset' not in checkpoint:
+        raise TransferError(
+            f'В контрольной точке {checkpoint_path(path)} нет смещения'
+        )
+    return checkpoint['offset'], checkpoint['done']
+
+
+def _write_checkpoint(path, kind, offset, done):
+    temp_path = checkpoint_path(path) + '.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump({'kind': kind, 'offset': offset, 'done': done}, file)
+    os.replace(temp_path, checkpoint_path(path))
+
+
+def import_file(kind, path, fmt=None, batch_size=TRANSFER_BATCH_SIZE,
+                resume=False, progress=None, source=''):
+    """
+    Импортирует записи kind из файла path сайта source. При resume
+    продолжает с контрольной точки. progress(done) вызывается после
+    каждой пачки. Возвращает число обработанных записей.
+    """
+    importer = IMPORTERS[kind]
+    offset, done = read_checkpoint(path, kind) if resume else (0, 0)
+    with open(path, 'rb') as file:
+        records = read_records(file, fmt or guess_format(path), offset)
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                authors = importer([record for record, _ in batch], source)
+                if authors:
+                    rebuild_stats(User.objects.filter(pk__in=authors))
+            done += len(batch)
+            _write_checkpoint(path, kind, batch[-1][1], done)
+            if progress is not None:
+                progress(done)
+    if os.path.exists(checkpoint_path(path)):
+        os.remove(checkpoint_path(path))
+    # Импорт идёт в обход сигналов: сбрасываем кэш всех страниц лент.
+    bump_tags('posts', 'groups')
+    return done
+
+
+def export_file(kind, path, fmt=None, batch_size=TRANSFER_BATCH_SIZE):
+    """Выгружает записи kind в файл path и возвращает их число."""
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        return write_records(
+            file,
+            fmt or guess_format(path),
+            list(EXPORT_FIELDS[kind]),
+            export_records(kind, batch_size),
+        )
@@ -1,19 +1,34 @@
-from django.views.decorators.cache import cache_page
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_POST
+
+from posts import follows
+from posts.api import serialize_user
+from posts.caching import add_cache_tags, cache_page_by_tags
+from posts.conditional import (
+    conditional_page, group_state, index_state, post_detail_state,
+    profile_state,
+)
+from posts.follow_graph import is_following
 from posts.forms import CommentForm, PostForm
-from posts.models import Follow, Group, Post, User
-from posts.services import get_page_obj
-
-CACHE_TIMER_PER_SEC = 20
-
-
-@cache_page(CACHE_TIMER_PER_SEC, key_prefix='index_page')
+from posts.models import Follow, Post, User
+from posts.search import get_search_backend
+from posts.services import (
+    NUM_POSTS_PER_PAGE, get_comments_page, get_feed_queryset, get_group,
+    get_page_obj,
+)
+from posts.thumbnails import CARD_VARIANTS, prefetch_thumbnails
+from posts.timeline import TimelinePaginator, get_timeline
+
+
+@conditional_page(index_state)
+@cache_page_by_tags('posts', 'groups')
 def index(request):
     """Возвращает главную страницу"""
     template = 'posts/index.html'
-    post_list = Post.objects.select_related('author')
+    post_list = get_feed_queryset()
     page_obj = get_page_obj(request, post_list)
     context = {
         'page_obj': page_obj,
@@ -21,11 +36,14 @@ def index(request):
     return render(request, template, context)
 
 
+@conditional_page(group_state)
+@cache_page_by_tags('groups')
 def group_posts(request, slug):
     """Возвращает страницу с постами группы"""
-    group = get_object_or_404(Group, slug=slug)
+    group = get_group(slug)
+    add_cache_tags(request, f'group:{group.pk}')
     template = 'posts/group_list.html'
-    post_list = group.posts.select_related('group').all()
+    post_list = get_feed_queryset(group.posts.all())
     page_obj = get_page_obj(request, post_list)
     context = {
         'group': group,
@@ -34,6 +52,19 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+def search(request):
+    """Возвращает страницу поиска по текстам постов"""
+    query = request.GET.get('q', '').strip()
+    template = 'posts/search.html'
+    post_list = get_feed_queryset(get_search_backend().search(query))
+    page_obj = get_page_obj(request, post_list)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 @login_required(login_url='/auth/login')
 def post_create(request):
     """Возвращает страницу создания поста"""
@@ -73,15 +104,18 @@ def post_edit(request, post_id):
     return render(request, template, context)
 
 
+@conditional_page(profile_state)
+@cache_page_by_tags('groups')
 def profile(request, username):
     """Возвращает страницу профайла пользователя"""
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username,
+    )
+    add_cache_tags(request, f'author:{author.pk}')
     template = 'posts/profile.html'
-    following = Follow.objects.filter(
-        user=request.user.id,
-        author=author.id,
-    ).exists()
-    post_list = author.posts.all()
+    following = is_following(request.user, author.pk)
+    post_list = get_feed_queryset(author.posts.all())
     page_obj = get_page_obj(request, post_list)
     context = {
         'author': author,
@@ -91,11 +125,19 @@ def profile(request, username):
     return render(request, template, context)
 
 
+@conditional_page(post_detail_state)
+@cache_page_by_tags('groups', anonymous_only=True)
 def post_detail(request, post_id):
     """Возвращает страницу подробной информации о посте"""
-    post = get_object_or_404(Post, pk=post_id)
+    add_cache_tags(request, f'post:{post_id}')
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        pk=post_id,
+    )
+    add_cache_tags(request, f'author:{post.author_id}')
+    prefetch_thumbnails([post], *CARD_VARIANTS)
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments = get_comments_page(post.pk, request.GET.get('cursor'))
     template = 'posts/post_detail.html'
     context = {
         'post': post,
@@ -105,6 +147,20 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+@cache_page_by_tags()
+def post_comments(request, post_id):
+    """Возвращает следующую порцию комментариев поста в JSON"""
+    add_cache_tags(request, f'post:{post_id}')
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = get_comments_page(post.pk, request.GET.get('cursor'))
+    html = render_to_string(
+        'posts/includes/comments.html',
+        {'comments': comments},
+        request,
+    )
+    return JsonResponse({'html': html, 'next_cursor': comments.next_cursor})
+
+
 @login_required(login_url='/auth/login')
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -121,8 +177,12 @@ def add_comment(request, post_id):
 def follow_index(request):
     """Возвращает страницу с постами авторов, на которых есть подписка"""
     template = 'posts/index.html'
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_page_obj(request, post_list)
+    post_list = get_feed_queryset(get_timeline(request.user))
+    page_obj = get_page_obj(
+        request,
+        post_list,
+        TimelinePaginator(request.user, NUM_POSTS_PER_PAGE),
+    )
     context = {
         'page_obj': page_obj,
     }
@@ -134,7 +194,7 @@ def profile_follow(request, username):
     """Обрабатывает кнопку 'Подписаться' на странице profile"""
     author = get_object_or_404(User, username=username)
     user = request.user
-    if author != user:
+    if author != user and not is_following(user, author.pk):
         Follow.objects.get_or_create(user=user, author=author)
     return redirect('posts:profile', username=username)
 
@@ -144,5 +204,41 @@ def profile_unfollow(request, username):
     """Обрабатывает кнопку 'Отписаться' на странице profile"""
     author = get_object_or_404(User, username=username)
     user = request.user
-    Follow.objects.get(user=user, author=author).delete()
+    Follow.objects.filter(user=user, author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+def _usernames(request):
+    """username из POST: повторяющееся поле или список через запятую."""
+    return {
+        username.strip()
+        for value in request.POST.getlist('usernames')
+        for username in value.split(',')
+        if username.strip()
+    }
+
+
+@login_required(login_url='/auth/login')
+@require_POST
+def follow_bulk(request):
+    """Подписывает на нескольких авторов за один запрос"""
+    followed = follows.follow_many(request.user, _usernames(request))
+    return JsonResponse({'followed': followed})
+
+
+@login_required(login_url='/auth/login')
+@require_POST
+def unfollow_bulk(request):
+    """Отписывает от нескольких авторов за один запрос"""
+    unfollowed = follows.unfollow_many(request.user, _usernames(request))
+    return JsonResponse({'unfollowed': unfollowed})
+
+
+@login_required(login_url='/auth/login')
+def follow_suggestions(request):
+    """Возвращает в JSON авторов, на которых стоит подписаться"""
+    suggestions = follows.get_suggestions(request.user)
+    return JsonResponse({'suggestions': [
+        dict(serialize_user(suggestion.author), score=suggestion.score)
+        for suggestion in suggestions
+    ]})
@@ -0,0 +1,54 @@
+"""
+Прогрев первых страниц групп.
+
+Первую страницу группы открывают чаще остальных, поэтому при
+WARM_GROUP_PAGES она не ждёт первого посетителя: warm_group_pages()
+отрисовывает её для анонимного пользователя при старте процесса
+(см. yatube/wsgi.py) и заново после каждого изменения группы или её
+постов, когда тег `group:<id>` уже поднят.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.test import RequestFactory
+from django.urls import reverse
+
+from posts.models import Group
+
+logger = logging.getLogger(__name__)
+
+
+def warm_group_pages(group_ids=None):
+    """
+    Кладёт в кэш первые страницы групп group_ids (по умолчанию всех).
+    Возвращает число прогретых страниц.
+    """
+    from posts.views import group_posts
+
+    groups = Group.objects.order_by('pk')
+    if group_ids is not None:
+        groups = groups.filter(pk__in=group_ids)
+    factory = RequestFactory()
+    warmed = 0
+    for slug in groups.values_list('slug', flat=True).iterator():
+        request = factory.get(reverse('posts:group_posts', args=[slug]))
+        request.user = AnonymousUser()
+        try:
+            group_posts(request, slug=slug)
+        except Exception:
+            logger.exception('Не удалось прогреть страницу группы %s', slug)
+        else:
+            warmed += 1
+    return warmed
+
+
+def schedule_group_pages(*group_ids):
+    """
+    Прогревает страницы групп после коммита транзакции, то есть после
+    повторного подъёма тегов в bump_tags().
+    """
+    group_ids = [group_id for group_id in group_ids if group_id]
+    if settings.WARM_GROUP_PAGES and group_ids:
+        transaction.on_commit(lambda: warm_group_pages(group_ids))
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ViewMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +59,40 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+INTERNAL_IPS = ['127.0.0.1']
+# Отдавать заголовок Server-Timing и страницу /metrics/ с INTERNAL_IPS.
+# За прокси REMOTE_ADDR всегда 127.0.0.1, поэтому в бою выключено:
+# там метрики видят только сотрудники (is_staff).
+EXPOSE_METRICS = DEBUG
+
+# Бюджет SQL-запросов на один запрос к view, вместе с запросами
+# сессии и пользователя, при пустом кэше страницы. При VIEW_BUDGETS_STRICT превышение бюджета
+# роняет запрос (и тест), иначе только пишется в лог.
+VIEW_QUERY_BUDGETS = {
+    'posts:index': 6,
+    'posts:group_posts': 7,
+    'posts:profile': 8,
+    'posts:post_detail': 7,
+    'posts:post_comments': 4,
+    # Записи ленты и посты страницы, плюс запрос на каждого pull-автора.
+    'posts:follow_index': 9,
+    'posts:search': 5,
+    'posts:api_index': 4,
+    'posts:api_group_posts': 5,
+    'posts:api_profile': 5,
+    'posts:api_follow_index': 6,
+    'posts:api_post_detail': 5,
+}
+VIEW_BUDGETS_STRICT = False
+# Писать в лог при старте предупреждения о медленных настройках
+# (они же выводятся командой `manage.py check --deploy`).
+PERFORMANCE_SELF_CHECK = False
+# Компилировать шаблоны и разбирать URL при старте WSGI-процесса.
+WARMUP_ON_STARTUP = False
+# Держать в кэше первые страницы групп: отрисовывать их при старте и
+# после каждого изменения группы (см. posts/warmup.py).
+WARM_GROUP_PAGES = False
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -91,6 +126,9 @@ DATABASES = {
     }
 }
 
+# PRAGMA, которые выполняются для каждого нового соединения с SQLite.
+SQLITE_PRAGMAS = {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -142,9 +180,31 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Загруженные файлы называются по хешу содержимого и раскладываются по
+# вложенным каталогам. Миниатюрам sorl нужны имена, которые он выбрал
+# сам, поэтому у них обычное файловое хранилище.
+DEFAULT_FILE_STORAGE = 'posts.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+# Кто передаёт байты медиафайлов после проверки доступа в core.views.media:
+# None — сам Django (FileResponse, sendfile через wsgi.file_wrapper),
+# 'x-accel-redirect' — nginx, 'x-sendfile' — Apache или lighttpd.
+MEDIA_SENDFILE = None
+# internal-location nginx, который смотрит в MEDIA_ROOT.
+MEDIA_SENDFILE_PREFIX = '/protected-media/'
 
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
     }
 }
+
+# Формат, в который пережимаются загруженные картинки постов
+# ('JPEG', 'PNG', 'WEBP'); None — оставлять формат исходника.
+POST_IMAGE_FORMAT = None
+
+THUMBNAIL_BACKEND = 'posts.thumbnails.BackgroundThumbnailBackend'
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+# Заглушка, которую показываем, пока миниатюра создаётся в фоне.
+THUMBNAIL_DUMMY_SOURCE = (
+    'data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7'
+)
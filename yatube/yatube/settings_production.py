@@ -0,0 +1,128 @@
+"""
+Настройки Yatube для боевого окружения.
+
+Наследуют yatube.settings и переопределяют то, что мешает работе под
+нагрузкой; значения берутся из переменных окружения. Подключаются так:
+DJANGO_SETTINGS_MODULE=yatube.settings_production.
+"""
+import os
+from urllib.parse import urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+from yatube.settings import *  # noqa: F401, F403
+from yatube.settings import DATABASES, TEMPLATES
+
+
+def env(name, default=None):
+    return os.environ.get(name, default)
+
+
+def env_bool(name, default):
+    return env(name, str(int(default))).lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_list(name, default):
+    return [item.strip() for item in env(name, default).split(',')
+            if item.strip()]
+
+
+SECRET_KEY = env('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Задайте переменную DJANGO_SECRET_KEY')
+
+DEBUG = env_bool('DJANGO_DEBUG', False)
+ALLOWED_HOSTS = env_list('DJANGO_ALLOWED_HOSTS', 'localhost')
+
+DATABASES = {
+    'default': dict(
+        DATABASES['default'],
+        NAME=env('DJANGO_DB_PATH', DATABASES['default']['NAME']),
+        # Соединение живёт между запросами, а не открывается на каждый.
+        CONN_MAX_AGE=int(env('DJANGO_CONN_MAX_AGE', 600)),
+    ),
+}
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(env('DJANGO_SQLITE_BUSY_TIMEOUT', 5000)),
+}
+
+# Медиафайлы отдаёт веб-сервер по заголовку от core.views.media.
+MEDIA_SENDFILE = env('DJANGO_MEDIA_SENDFILE') or None
+MEDIA_SENDFILE_PREFIX = env(
+    'DJANGO_MEDIA_SENDFILE_PREFIX', '/protected-media/'
+)
+
+# Общий для всех процессов кэш. Версии тегов (bump_tags) и блокировка
+# отрисовки страницы держатся на атомарных incr и add, поэтому нужен
+# кэш-сервер: DJANGO_CACHE_URL вида memcached://host:11211 (нужен
+# python-memcached), pylibmc://host:11211 или redis://host:6379/0
+# (нужен django-redis). Файловый кэш (file:///путь) — только запасной
+# вариант для одного сервера: его incr и add не атомарны, а при
+# переполнении он обходит весь каталог, поэтому записей в нём немного.
+# Увеличение DJANGO_CACHE_VERSION при выкладке делает недействительными
+# все ключи.
+CACHE_BACKENDS = {
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'pylibmc': 'django.core.cache.backends.memcached.PyLibMCCache',
+    'redis': 'django_redis.cache.RedisCache',
+    'rediss': 'django_redis.cache.RedisCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+FILE_CACHE_MAX_ENTRIES = 3000
+
+
+def cache_from_url(url):
+    parsed = urlsplit(url)
+    if parsed.scheme not in CACHE_BACKENDS:
+        raise ImproperlyConfigured(
+            f'Неизвестный кэш в DJANGO_CACHE_URL: {parsed.scheme}'
+        )
+    config = {'BACKEND': CACHE_BACKENDS[parsed.scheme]}
+    if parsed.scheme.startswith('redis'):
+        config['LOCATION'] = url
+    elif parsed.scheme == 'file':
+        config['LOCATION'] = parsed.path
+        config['OPTIONS'] = {'MAX_ENTRIES': int(env(
+            'DJANGO_CACHE_MAX_ENTRIES', FILE_CACHE_MAX_ENTRIES
+        ))}
+    else:
+        config['LOCATION'] = parsed.netloc or f'unix:{parsed.path}'
+    return config
+
+
+CACHES = {
+    'default': dict(
+        cache_from_url(
+            env('DJANGO_CACHE_URL', 'memcached://127.0.0.1:11211')
+        ),
+        KEY_PREFIX=env('DJANGO_CACHE_KEY_PREFIX', 'yatube'),
+        VERSION=int(env('DJANGO_CACHE_VERSION', 1)),
+        TIMEOUT=int(env('DJANGO_CACHE_TIMEOUT', 300)),
+    ),
+}
+
+# Шаблоны компилируются один раз на процесс, при старте WSGI-процесса.
+TEMPLATES = [dict(
+    TEMPLATES[0],
+    APP_DIRS=False,
+    OPTIONS=dict(
+        TEMPLATES[0]['OPTIONS'],
+        loaders=[(
+            'django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ],
+        )],
+    ),
+)]
+
+# Server-Timing и /metrics/ для INTERNAL_IPS; за nginx REMOTE_ADDR
+# у всех запросов 127.0.0.1, поэтому по умолчанию выключено.
+EXPOSE_METRICS = env_bool('DJANGO_EXPOSE_METRICS', False)
+
+WARMUP_ON_STARTUP = env_bool('DJANGO_WARMUP_ON_STARTUP', True)
+WARM_GROUP_PAGES = env_bool('DJANGO_WARM_GROUP_PAGES', True)
+
+PERFORMANCE_SELF_CHECK = env_bool('DJANGO_PERFORMANCE_SELF_CHECK', True)